@@ -1,6 +1,7 @@
 """Log License."""
 from loglicense.licenselogger import LicenseLogger
+from loglicense.licenselogger import PackageLicense
 from loglicense.utils import DependencyFileParser
 
 
-__all__ = ["LicenseLogger", "DependencyFileParser"]
+__all__ = ["LicenseLogger", "PackageLicense", "DependencyFileParser"]
@@ -1,21 +1,99 @@
 """Command-line interface."""
 import configparser
+import json
+import logging
 import os
-from difflib import get_close_matches
+import tempfile
+import time
+from functools import partial
 from pathlib import Path
+from typing import Annotated
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Set
+from typing import Tuple
 
 import typer
+from packaging.utils import canonicalize_name
 from tabulate import tabulate
 
 from loglicense import LicenseLogger
+from loglicense.cache import MetadataCache
+from loglicense.cache import default_cache_dir
+from loglicense.inventory import INVENTORY_HEADER
+from loglicense.inventory import Inventory
+from loglicense.inventory import file_digest
+from loglicense.lockfile import LicenseLock
+from loglicense.lockfile import lock_entry
+from loglicense.lockfile import lock_path
+from loglicense.lockfile import read_lock
+from loglicense.lockfile import write_lock
+from loglicense.policy import ACCEPTED_STATUSES
+from loglicense.policy import BannedLicenseError
+from loglicense.policy import CheckResult
+from loglicense.policy import LicensePolicy
+from loglicense.revisions import BlobReader
+from loglicense.revisions import checkout_file
+from loglicense.revisions import dependency_file_at
+from loglicense.revisions import file_revisions
+from loglicense.sources import MAX_RESPONSE_SIZE
+from loglicense.trace import span
+from loglicense.trace import start_tracing
+from loglicense.trace import stop_tracing
 from loglicense.utils import DependencyFileParser
+from loglicense.utils import diff_packages
+from loglicense.utils import parse_environment
+from loglicense.utils import parse_shard
+from loglicense.utils import uv_member_attribution
+from loglicense.watch import FileWatcher
 
 
+logger = logging.getLogger("licenselogger")
+
 app = typer.Typer()
+cache_app = typer.Typer(help="Manage the metadata cache.")
+app.add_typer(cache_app, name="cache")
 OK, ERR, FAIL_UNDER = typer.Exit(code=0), typer.Exit(code=1), typer.Exit(code=2)
+CHECK_COLUMNS = ["name", "version", "license"]
+MEMBER_HEADER = ["Member", "Packages", "Coverage", "Verdict"]
+VERDICTS = {0: "Passed", 1: "Banned", 2: "Below coverage"}
+DIFF_HEADER = [
+    "Name",
+    "Change",
+    "Old version",
+    "New version",
+    "Old license",
+    "New license",
+    "Status",
+]
+
+
+@app.callback()
+def main(ctx: typer.Context, trace_out: Optional[str] = None) -> None:
+    """Log and check the licenses of the dependencies of Python projects.
+
+    Args:
+        ctx: Context of the invoked command
+        trace_out: File to write a timeline of parsing, fetching, validating
+            and rendering to, in the Chrome trace event format read by
+            Perfetto and chrome://tracing
+    """
+    if trace_out:
+        start_tracing()
+        ctx.call_on_close(partial(write_trace, Path(trace_out)))
+
+
+def write_trace(path: Path) -> None:
+    """Stop tracing and write the recorded timeline.
+
+    Args:
+        path: File to write the timeline to
+    """
+    tracer = stop_tracing()
+    if tracer is not None:
+        tracer.write(path)
 
 
 def search_dependency_file() -> str:
@@ -40,41 +118,83 @@ def search_dependency_file() -> str:
 @app.command()
 def report(
     dependency_file: Optional[str] = None,
+    config_file: str = ".loglicense",
     package_manager: str = "pypi",
     info_columns: Optional[str] = None,
     tablefmt: str = "pipe",
     develop: bool = False,
     output_file: Optional[str] = None,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    deep_license: bool = False,
+    source: Optional[Tuple[str, str]] = None,
+    transitive: bool = False,
+    environment: Optional[str] = None,
+    deadline: Optional[float] = None,
 ) -> None:
     """Document licenses of packages in dependency file.
 
     Args:
         dependency_file: Specify file to crawl dependencies for.
             Defaults to search directory for supported files.
+        config_file: Config to read the metadata sources from
         package_manager: Which type of package manager to evaluate.
             Defaults to pypi for python.
         info_columns: Information to include in table to log
         tablefmt: Tabulates formatting argument
         develop: Whether to include development dependencies
         output_file: File to save table of licenses in
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        deep_license: Read licenses from the license files of remote wheels
+            when the metadata lacks a usable license
+        source: Kind and path of an alternative dependency source instead of
+            a dependency file: wheelhouse DIR reads the metadata from the
+            wheels and sdists of a directory, image-tar FILE reads the
+            packages installed in a docker save or virtual environment
+            tarball, sbom FILE reads a CycloneDX or SPDX SBOM or pip inspect
+            report
+        transitive: Also log the dependencies of the packages, recursively
+        environment: Comma separated key=value marker variables of the
+            target environment of transitive dependencies, such as
+            python_version=3.8. Defaults to the running interpreter.
+        deadline: Seconds after which outstanding lookups are abandoned and
+            their packages reported as unresolved
     """
     information_columns = (
         info_columns.split(",") if info_columns else ["name", "license"]
     )
 
-    if not dependency_file:
-        dependency_file = search_dependency_file()
+    dependency_source, dependency_file = resolve_dependency_source(
+        dependency_file, source
+    )
 
     license_log = LicenseLogger(
         dependency_file=dependency_file,
         package_manager=package_manager,
         info_columns=information_columns,
         develop=develop,
+        workers=workers,
+        cache_dir=cache_dir,
+        offline=offline,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
+        deep_license=deep_license,
+        dependency_source=dependency_source,
+        transitive=transitive,
+        environment=parse_environment(environment) if environment else None,
+        deadline=deadline,
     )
 
-    license_table = tabulate(
-        license_log.log_licenses(), tablefmt=tablefmt, headers="firstrow"
-    )
+    license_rows = license_log.log_licenses()
+    with span("render"):
+        license_table = tabulate(license_rows, tablefmt=tablefmt, headers="firstrow")
 
     if output_file:
         output_filepath = Path(output_file)
@@ -92,9 +212,26 @@ def check(
     develop: bool = False,
     show_report: bool = False,
     output_file: Optional[str] = None,
+    shard: Optional[str] = None,
+    shard_file: Optional[str] = None,
+    fail_fast: bool = False,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    deep_license: bool = False,
+    source: Optional[Tuple[str, str]] = None,
+    transitive: bool = False,
+    environment: Optional[str] = None,
+    deadline: Optional[float] = None,
+    lock_file: Optional[str] = None,
+    members: bool = False,
 ) -> None:
     """Check licenses of packages in dependency file.
 
+    Packages recorded in the license lock of the dependency file are checked
+    from the lock, without lookups.
+
     Args:
         dependency_file: File to crawl dependencies for
         config_file: Config for parameters of the license check
@@ -103,74 +240,1044 @@ def check(
         develop: Whether to include development dependencies
         show_report: Print information regarding licences checked
         output_file: File to save table of licenses in
+        shard: Only check shard i/N of the packages and write a partial
+            result file, to be combined with the merge command
+        shard_file: File to save the partial result of a shard in.
+            Defaults to loglicense-shard-i-of-N.json
+        fail_fast: Validate every package as soon as it resolves and stop at
+            the first banned license, cancelling the pending fetches
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        deep_license: Read licenses from the license files of remote wheels
+            when the metadata lacks a usable license
+        source: Kind and path of an alternative dependency source instead of
+            a dependency file: wheelhouse DIR reads the metadata from the
+            wheels and sdists of a directory, image-tar FILE reads the
+            packages installed in a docker save or virtual environment
+            tarball, sbom FILE reads a CycloneDX or SPDX SBOM or pip inspect
+            report
+        transitive: Also log the dependencies of the packages, recursively
+        environment: Comma separated key=value marker variables of the
+            target environment of transitive dependencies, such as
+            python_version=3.8. Defaults to the running interpreter.
+        deadline: Seconds after which outstanding lookups are abandoned and
+            their packages reported as unresolved
+        lock_file: License lock to check from. Defaults to the loglicense.lock
+            next to the dependency file, if there is one.
+        members: Also print the verdict of each member of a uv workspace,
+            judged on the packages it uses
 
     Raises:
         OK: 0 exit code
         ERR: 1 exit code
-        FAIL_UNDER: 2 exit code
+        BadParameter: If members are asked for without a uv.lock dependency
+            file
     """
-    cf = configparser.ConfigParser()
-    cf.read(config_file)
-    config = cf["loglicense"]
+    policy = LicensePolicy.from_config(config_file)
+
+    dependency_source, dependency_file = resolve_dependency_source(
+        dependency_file, source
+    )
+
+    shard_spec = parse_shard(shard) if shard else None
+    lock = find_lock(lock_file, dependency_source, dependency_file)
+
+    license_log = LicenseLogger(
+        dependency_file=dependency_file,
+        package_manager=package_manager,
+        info_columns=CHECK_COLUMNS,
+        develop=develop,
+        shard=shard_spec,
+        workers=workers,
+        cache_dir=cache_dir,
+        offline=offline,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
+        deep_license=deep_license,
+        dependency_source=dependency_source,
+        transitive=transitive,
+        environment=parse_environment(environment) if environment else None,
+        deadline=deadline,
+        locked=lock.metadata() if lock else None,
+    )
+    if members and license_log.parser != DependencyFileParser.parse_uv_lock:
+        raise typer.BadParameter(
+            "member verdicts need a uv.lock dependency file", param_hint="--members"
+        )
+
+    if fail_fast:
+        try:
+            license_log.log_licenses(partial(policy.ensure_not_banned, CHECK_COLUMNS))
+        except BannedLicenseError as error:
+            print(error)
+            raise ERR from None
+
+    result = policy.check(license_log.table())
+    if members:
+        print(
+            tabulate(
+                member_verdicts(license_log, policy, develop),
+                tablefmt="pipe",
+                headers="firstrow",
+                disable_numparse=True,
+            )
+        )
+    if lock is not None:
+        for note in lock_drift(lock, policy, license_log.packages()):
+            print(note)
+
+    if shard_spec:
+        index, count = shard_spec
+        write_shard_results(
+            shard_file or f"loglicense-shard-{index}-of-{count}.json",
+            license_log,
+            result.results,
+        )
+        raise OK
+
+    conclude_check(result, show_report, output_file)
+
+
+@app.command()
+def run(
+    dependency_file: Optional[str] = None,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    info_columns: Optional[str] = None,
+    tablefmt: str = "pipe",
+    develop: bool = False,
+    show_report: bool = False,
+    report_file: Optional[str] = None,
+    check_file: Optional[str] = None,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    deep_license: bool = False,
+    source: Optional[Tuple[str, str]] = None,
+    transitive: bool = False,
+    environment: Optional[str] = None,
+    deadline: Optional[float] = None,
+) -> None:
+    """Report and check licenses of packages, fetching their metadata once.
+
+    Args:
+        dependency_file: File to crawl dependencies for
+        config_file: Config for parameters of the license check
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        info_columns: Information to include in the report table
+        tablefmt: Tabulates formatting argument of the report table
+        develop: Whether to include development dependencies
+        show_report: Print information regarding licences checked
+        report_file: File to save the report table in instead of printing it
+        check_file: File to save the table of checked licenses in
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        deep_license: Read licenses from the license files of remote wheels
+            when the metadata lacks a usable license
+        source: Kind and path of an alternative dependency source instead of
+            a dependency file: wheelhouse DIR reads the metadata from the
+            wheels and sdists of a directory, image-tar FILE reads the
+            packages installed in a docker save or virtual environment
+            tarball, sbom FILE reads a CycloneDX or SPDX SBOM or pip inspect
+            report
+        transitive: Also log the dependencies of the packages, recursively
+        environment: Comma separated key=value marker variables of the
+            target environment of transitive dependencies, such as
+            python_version=3.8. Defaults to the running interpreter.
+        deadline: Seconds after which outstanding lookups are abandoned and
+            their packages reported as unresolved
+    """
+    policy = LicensePolicy.from_config(config_file)
+    report_columns = info_columns.split(",") if info_columns else ["name", "license"]
+
+    dependency_source, dependency_file = resolve_dependency_source(
+        dependency_file, source
+    )
+
+    extra_columns = [x for x in report_columns if x not in CHECK_COLUMNS]
+    license_log = LicenseLogger(
+        dependency_file=dependency_file,
+        package_manager=package_manager,
+        info_columns=CHECK_COLUMNS[:-1] + extra_columns + CHECK_COLUMNS[-1:],
+        develop=develop,
+        workers=workers,
+        cache_dir=cache_dir,
+        offline=offline,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
+        deep_license=deep_license,
+        dependency_source=dependency_source,
+        transitive=transitive,
+        environment=parse_environment(environment) if environment else None,
+        deadline=deadline,
+    )
+
+    report_table = license_log.table(report_columns)
+    with span("render"):
+        license_table = tabulate(report_table, tablefmt=tablefmt, headers="firstrow")
+    if report_file:
+        Path(report_file).write_text(license_table)
+    else:
+        print(license_table)
+
+    result = policy.check(license_log.table(CHECK_COLUMNS))
+    conclude_check(result, show_report, check_file)
+
+
+@app.command()
+def lock(
+    dependency_file: Optional[str] = None,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    lock_file: Optional[str] = None,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    deep_license: bool = False,
+) -> None:
+    """Record the licenses and verdicts of the packages in a license lock.
+
+    Packages already in the lock are kept without lookups, packages no longer
+    in the dependency file are dropped. Commit the lock, so check runs
+    without network access and license changes show up in reviews.
+
+    Args:
+        dependency_file: File to crawl dependencies for.
+            Defaults to search directory for supported files.
+        config_file: Config for parameters of the license check
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        lock_file: License lock to write. Defaults to loglicense.lock next to
+            the dependency file.
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        deep_license: Read licenses from the license files of remote wheels
+            when the metadata lacks a usable license
+    """
+    policy = LicensePolicy.from_config(config_file)
+    dependency_file = dependency_file or search_dependency_file()
+    path = Path(lock_file) if lock_file else lock_path(Path(dependency_file))
+    current = read_lock(path)
+
+    license_log = LicenseLogger(
+        dependency_file=dependency_file,
+        package_manager=package_manager,
+        info_columns=CHECK_COLUMNS,
+        develop=develop,
+        workers=workers,
+        cache_dir=cache_dir,
+        offline=offline,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
+        deep_license=deep_license,
+        locked=current.metadata() if current else None,
+    )
+    keys = license_log.packages()
+    metadata = license_log.fetch_metadata(keys)
+    if license_log.deep_license:
+        license_log.add_wheel_licenses(metadata)
 
+    packages = {}
+    for key in keys:
+        if metadata[key]:
+            row = license_log.format_row(key, metadata[key])
+            results = policy.validate([CHECK_COLUMNS, row])[1:]
+            packages[key] = lock_entry(metadata[key], results)
+    write_lock(path, LicenseLock(policy.digest(), packages))
+    print(f"Locked {len(packages)} of {len(keys)} packages in {path}")
+
+
+@app.command()
+def merge(
+    shard_files: List[str],
+    config_file: str = ".loglicense",
+    show_report: bool = False,
+    output_file: Optional[str] = None,
+) -> None:
+    """Merge partial results of a sharded check into the final verdict.
+
+    Args:
+        shard_files: Partial result files written by check --shard
+        config_file: Config for parameters of the license check
+        show_report: Print information regarding licences checked
+        output_file: File to save table of licenses in
+    """
+    policy = LicensePolicy.from_config(config_file)
+    results = read_shard_results(shard_files)
+    result = CheckResult(results, policy.coverage, policy.unresolved)
+    conclude_check(result, show_report, output_file)
+
+
+@app.command()
+def diff(
+    old: str,
+    new: Annotated[Optional[str], typer.Argument()] = None,
+    dependency_file: Optional[str] = None,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    tablefmt: str = "pipe",
+    output_file: Optional[str] = None,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+) -> None:
+    """Check licenses of the packages changed between two dependency files.
+
+    Only added and version-changed packages are looked up and validated.
+
+    Args:
+        old: Old dependency file, as a path, a git revision of the dependency
+            file or revision:path
+        new: New dependency file, given like old. Defaults to the dependency
+            file itself.
+        dependency_file: Dependency file of bare git revisions.
+            Defaults to search directory for supported files.
+        config_file: Config for parameters of the license check
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        tablefmt: Tabulates formatting argument
+        output_file: File to save table of changes in
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+
+    Raises:
+        ERR: 1 exit code if a changed package has a banned license
+    """
+    policy = LicensePolicy.from_config(config_file)
     if not dependency_file:
         dependency_file = search_dependency_file()
 
+    with tempfile.TemporaryDirectory() as workdir:
+        loggers = [
+            LicenseLogger(
+                dependency_file=dependency_file_at(
+                    spec, dependency_file, Path(workdir) / side
+                ),
+                package_manager=package_manager,
+                info_columns=CHECK_COLUMNS,
+                develop=develop,
+                workers=workers,
+                cache_dir=cache_dir,
+                offline=offline,
+                sources=metadata_sources(sources, config_file),
+                **logger_settings(config_file),
+            )
+            for side, spec in (("old", old), ("new", new or dependency_file))
+        ]
+        changes = diff_packages(loggers[0].packages(), loggers[1].packages())
+
+    license_log = loggers[1]
+    metadata = license_log.fetch_metadata([x for pair in changes for x in pair if x])
+    rows = [DIFF_HEADER]
+    for old_key, new_key in changes:
+        row = diff_row(license_log, metadata, old_key, new_key)
+        statuses = [policy.status(row[0], x) for x in row[-1].split("\n")]
+        rows.append(row + ["\n".join(dict.fromkeys(statuses)) if new_key else ""])
+    violations = sum(1 for x in rows[1:] if "Banned" in x[-1])
+
+    diff_table = "\n".join(
+        [
+            f"{len(changes)} changed packages, {violations} banned licenses",
+            "",
+            tabulate(
+                rows, tablefmt=tablefmt, headers="firstrow", disable_numparse=True
+            ),
+        ]
+    )
+    if output_file:
+        Path(output_file).write_text(diff_table)
+    else:
+        print(diff_table)
+    if violations:
+        raise ERR
+
+
+@app.command()
+def history(
+    path: str,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    tablefmt: str = "pipe",
+    output_file: Optional[str] = None,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+) -> None:
+    """Show when packages and their licenses entered and left a dependency file.
+
+    Every version of the file in the git history is read through a single
+    git process, and every package version is looked up once.
+
+    Args:
+        path: Dependency file tracked in git
+        config_file: Config to read the metadata sources from
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        tablefmt: Tabulates formatting argument
+        output_file: File to save the timeline in
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+
+    Raises:
+        ValueError: If the dependency file is not supported
+    """
+    parser = DependencyFileParser().resolve(Path(path).name)
+    if parser is None:
+        raise ValueError(f"Unsupported lock file: {Path(path).name}")
+
+    versions: List[Tuple[str, str, List[str]]] = []
+    parsed: Dict[Tuple[str, ...], List[str]] = {}
+    with tempfile.TemporaryDirectory() as workdir, BlobReader() as reader:
+        for commit, date in file_revisions(path):
+            try:
+                checkout = checkout_file(
+                    partial(reader.read, commit), path, Path(workdir) / commit
+                )
+                if checkout is not None and checkout[1] not in parsed:
+                    parsed[checkout[1]] = parser(checkout[0], develop=develop)
+            except ValueError as error:
+                logger.warning(f"{path} at {commit[:8]}: skipped, {error}")
+                continue
+            versions.append((commit, date, parsed[checkout[1]] if checkout else []))
+
+    license_log = LicenseLogger(
+        package_manager=package_manager,
+        info_columns=CHECK_COLUMNS,
+        workers=workers,
+        cache_dir=cache_dir,
+        offline=offline,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
+    )
+    metadata = license_log.fetch_metadata([x for *_, keys in versions for x in keys])
+
+    rows = [["Commit", "Date"] + DIFF_HEADER[:-1]]
+    previous: List[str] = []
+    for commit, date, packages in versions:
+        rows.extend(
+            [commit[:8], date] + diff_row(license_log, metadata, old_key, new_key)
+            for old_key, new_key in diff_packages(previous, packages)
+        )
+        previous = packages
+
+    timeline = tabulate(
+        rows, tablefmt=tablefmt, headers="firstrow", disable_numparse=True
+    )
+    if output_file:
+        Path(output_file).write_text(timeline)
+    else:
+        print(timeline)
+
+
+@app.command()
+def watch(
+    dependency_file: Optional[str] = None,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    deep_license: bool = False,
+    transitive: bool = False,
+    environment: Optional[str] = None,
+    interval: float = 0.5,
+    poll: bool = False,
+    max_checks: Optional[int] = None,
+) -> None:
+    """Check licenses again whenever the dependency file or the config changes.
+
+    The process and the metadata of every package seen stay warm, so after
+    a change only the packages not seen before are looked up. Changing the
+    config reloads the policy and the metadata sources.
+
+    Args:
+        dependency_file: File to crawl dependencies for
+        config_file: Config for parameters of the license check
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        deep_license: Read licenses from the license files of remote wheels
+            when the metadata lacks a usable license
+        transitive: Also log the dependencies of the packages, recursively
+        environment: Comma separated key=value marker variables of the
+            target environment of transitive dependencies, such as
+            python_version=3.8. Defaults to the running interpreter.
+        interval: Seconds between checks for changes when polling
+        poll: Poll for changes even where inotify is available
+        max_checks: Stop after this many checks. Defaults to watching until
+            interrupted.
+
+    Raises:
+        OK: 0 exit code when interrupted
+    """
+    if not dependency_file:
+        dependency_file = search_dependency_file()
+    config_path = Path(config_file).absolute()
+    paths = [Path(dependency_file), config_path]
+
+    license_log: Optional[LicenseLogger] = None
+    checks = 0
+    with FileWatcher(paths, interval, use_inotify=not poll) as watcher:
+        changed = paths
+        try:
+            while max_checks is None or checks < max_checks:
+                if checks:
+                    changed = watcher.wait()
+                checks += 1
+                started = time.perf_counter()
+                try:
+                    if license_log is None or config_path in changed:
+                        policy = LicensePolicy.from_config(config_file)
+                        license_log = LicenseLogger(
+                            dependency_file=dependency_file,
+                            package_manager=package_manager,
+                            info_columns=CHECK_COLUMNS,
+                            develop=develop,
+                            workers=workers,
+                            cache_dir=cache_dir,
+                            offline=offline,
+                            sources=metadata_sources(sources, config_file),
+                            **logger_settings(config_file),
+                            deep_license=deep_license,
+                            transitive=transitive,
+                            environment=(
+                                parse_environment(environment) if environment else None
+                            ),
+                        )
+                    result = policy.check(license_log.log_licenses())
+                except Exception as error:
+                    print(f"Error: {error}", flush=True)
+                    continue
+                print(watch_verdict(result, time.perf_counter() - started), flush=True)
+        except KeyboardInterrupt:
+            raise OK from None
+
+
+@app.command()
+def inventory(
+    dependency_files: Annotated[Optional[List[str]], typer.Argument()] = None,
+    database: str = "loglicense-inventory.sqlite",
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    offline: bool = False,
+    sources: Optional[str] = None,
+    uses: Optional[str] = None,
+    tablefmt: str = "pipe",
+) -> None:
+    """Add the licenses of many dependency files to a SQLite inventory.
+
+    The packages of all dependency files are looked up once. Dependency files
+    unchanged since they were added, under the same policy, are skipped, so
+    runs over many repositories only update the ones that changed.
+
+    Args:
+        dependency_files: Dependency files to add, one per repository
+        database: SQLite database of the inventory, created if missing
+        config_file: Config for parameters of the license check
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        offline: Only use cached metadata
+        sources: Comma separated, ordered metadata sources (installed, cache,
+            pypi or the URL of a PyPI JSON API mirror). Defaults to the
+            sources entry of the config file, or cache,pypi.
+        uses: Afterwards, list the packages of the inventory whose license
+            contains this text, such as AGPL
+        tablefmt: Tabulates formatting argument of the list of packages
+    """
+    policy = LicensePolicy.from_config(config_file)
+    dependency_files = dependency_files or []
+
+    with Inventory(database) as store:
+        changed = changed_dependency_files(store, dependency_files, policy, develop)
+        if changed:
+            license_log = LicenseLogger(
+                package_manager=package_manager,
+                info_columns=CHECK_COLUMNS,
+                workers=workers,
+                cache_dir=cache_dir,
+                offline=offline,
+                sources=metadata_sources(sources, config_file),
+                **logger_settings(config_file),
+            )
+            metadata = license_log.fetch_metadata(
+                [x for _, keys in changed.values() for x in keys]
+            )
+            for path, (digest, keys) in changed.items():
+                rows = [license_log.format_row(x, metadata[x]) for x in keys]
+                store.replace(path, digest, policy.validate([CHECK_COLUMNS] + rows)[1:])
+        print(f"Updated {len(changed)} of {len(dependency_files)} dependency files")
+
+        if uses:
+            print(
+                tabulate(
+                    [INVENTORY_HEADER] + store.query(lib_license=uses),
+                    tablefmt=tablefmt,
+                    headers="firstrow",
+                    disable_numparse=True,
+                )
+            )
+
+
+@cache_app.command()
+def prefetch(
+    dependency_file: str,
+    config_file: str = ".loglicense",
+    package_manager: str = "pypi",
+    develop: bool = False,
+    workers: int = 8,
+    cache_dir: Optional[str] = None,
+    sources: Optional[str] = None,
+) -> None:
+    """Resolve and cache metadata of every package in a dependency file.
+
+    Args:
+        dependency_file: File to crawl dependencies for
+        config_file: Config to read the metadata sources from
+        package_manager: Which type of package manager to evaluate.
+            Defaults to pypi for python.
+        develop: Whether to include development dependencies
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory of the metadata cache
+        sources: Comma separated, ordered metadata sources. Defaults to the
+            sources entry of the config file, or cache,pypi.
+    """
     license_log = LicenseLogger(
         dependency_file=dependency_file,
         package_manager=package_manager,
-        info_columns=["name", "version", "license"],
         develop=develop,
+        workers=workers,
+        cache_dir=cache_dir,
+        sources=metadata_sources(sources, config_file),
+        **logger_settings(config_file),
     )
+    metadata = license_log.fetch_metadata(license_log.packages())
+    found = sum(1 for x in metadata.values() if x)
+    print(f"Cached metadata of {found}/{len(metadata)} packages")
 
-    allowed = {
-        x.lower().strip() for x in config.get("allowed", "").split(",") if x.strip()
-    }
-    banned = {
-        x.lower().strip() for x in config.get("banned", "").split(",") if x.strip()
-    }
-    validated = {
-        x.lower().strip() for x in config.get("validated", "").split(",") if x.strip()
+
+@cache_app.command("export")
+def export_cache(bundle: str, cache_dir: Optional[str] = None) -> None:
+    """Export the metadata cache to a bundle file.
+
+    Args:
+        bundle: File to write the cache bundle to
+        cache_dir: Directory of the metadata cache
+    """
+    cache = MetadataCache(Path(cache_dir or default_cache_dir()) / "metadata.json")
+    print(f"Exported {cache.export_bundle(Path(bundle))} entries to {bundle}")
+
+
+@cache_app.command("import")
+def import_cache(bundle: str, cache_dir: Optional[str] = None) -> None:
+    """Import a bundle file into the metadata cache.
+
+    Args:
+        bundle: Cache bundle written by cache export
+        cache_dir: Directory of the metadata cache
+    """
+    cache = MetadataCache(Path(cache_dir or default_cache_dir()) / "metadata.json")
+    updated = cache.import_bundle(Path(bundle))
+    cache.save()
+    print(f"Imported {updated} entries from {bundle}")
+
+
+def resolve_dependency_source(
+    dependency_file: Optional[str], source: Optional[Tuple[str, str]]
+) -> Tuple[str, str]:
+    """Determine what to crawl dependencies from.
+
+    Args:
+        dependency_file: Dependency file given on the command line
+        source: Kind and path of an alternative dependency source
+
+    Returns:
+        Tuple[str, str]: The kind of dependency source and its path
+    """
+    if source and source[0]:
+        return source[0], source[1]
+    if not dependency_file:
+        dependency_file = search_dependency_file()
+    return "file", dependency_file
+
+
+def find_lock(
+    lock_file: Optional[str], dependency_source: str, dependency_file: str
+) -> Optional[LicenseLock]:
+    """Read the license lock to check from, if there is one.
+
+    Args:
+        lock_file: License lock given on the command line
+        dependency_source: The kind of dependency source
+        dependency_file: Path of the dependency source
+
+    Returns:
+        Optional[LicenseLock]: The lock, ``None`` if there is none
+    """
+    if lock_file:
+        return read_lock(Path(lock_file))
+    if dependency_source != "file":
+        return None
+    return read_lock(lock_path(Path(dependency_file)))
+
+
+def lock_drift(lock: LicenseLock, policy: LicensePolicy, keys: List[str]) -> List[str]:
+    """Describe how a license lock is out of date.
+
+    Args:
+        lock: The license lock checked from
+        policy: Policy of the check
+        keys: Package keys of the dependency file
+
+    Returns:
+        List[str]: Notes on the lock, empty if it is up to date
+    """
+    notes = []
+    if lock.policy != policy.digest():
+        notes.append("License lock was written under another policy, run lock")
+    unlocked = [x for x in keys if x not in lock.packages]
+    if unlocked:
+        notes.append(f"{len(unlocked)} packages not in the license lock, run lock")
+    return notes
+
+
+def read_config(config_file: str, section: str = "loglicense") -> Dict[str, str]:
+    """Read a section of the config file.
+
+    Args:
+        config_file: Path to the config file
+        section: Name of the section
+
+    Returns:
+        Dict[str, str]: The entries of the section, empty if missing
+    """
+    cf = configparser.ConfigParser()
+    cf.read(config_file)
+    return dict(cf[section]) if cf.has_section(section) else {}
+
+
+def logger_settings(config_file: str) -> Dict[str, Any]:
+    """Read the settings of the license logger from the config file.
+
+    Args:
+        config_file: Path to the config file
+
+    Returns:
+        Dict[str, Any]: Private packages, negative and hard cache TTLs and
+        maximum index response size, as keyword arguments of the license
+        logger
+    """
+    config = read_config(config_file)
+    return {
+        "private": read_config(config_file, "loglicense.private"),
+        "negative_ttl": float(config.get("negative_ttl", 3600)),
+        "max_response_size": int(config.get("max_response_size", MAX_RESPONSE_SIZE)),
+        "hard_ttl": float(config.get("hard_ttl", 604800)),
     }
-    results = validate_requirements(license_log, allowed, banned, validated)
 
-    result_status = [x[-1] for x in results[1:]]
 
-    if any([x == "Banned" for x in result_status]):
-        raise ERR
+def metadata_sources(sources: Optional[str], config_file: str) -> Optional[List[str]]:
+    """Determine the chain of metadata sources to use.
+
+    Args:
+        sources: Comma separated sources given on the command line
+        config_file: Config whose sources entry is used otherwise
+
+    Returns:
+        Optional[List[str]]: The ordered sources, ``None`` for the default
+    """
+    if not sources:
+        sources = read_config(config_file).get("sources")
+    if not sources:
+        return None
+    return [x.strip() for x in sources.split(",") if x.strip()]
 
-    try:
-        accepted = result_status.count("Allowed") + result_status.count(
-            "Manually validated"
-        )
-        license_coverage = int((accepted / len(result_status)) * 100)
-    except ZeroDivisionError:
-        license_coverage = 100
-
-    if "coverage" in config:
-        target_cov = int(config.get("coverage"))
-        coverage_score = (
-            f"Target license coverage ({target_cov}%) "
-            f"and actual coverage: {license_coverage}%"
-        )
 
-    pretty_print = tabulate(results, tablefmt="pipe", headers="firstrow")
+def conclude_check(
+    result: CheckResult,
+    show_report: bool,
+    output_file: Optional[str],
+) -> None:
+    """Report validation results and exit with the verdict of the check.
+
+    Args:
+        result: Verdict of the check
+        show_report: Print information regarding licences checked
+        output_file: File to save table of licenses in
+
+    Raises:
+        ERR: 1 exit code
+        Exit: The exit code of the verdict
+    """
+    if result.banned:
+        raise ERR
+
+    with span("render"):
+        pretty_print = tabulate(result.results, tablefmt="pipe", headers="firstrow")
 
     if output_file:
         output_filepath = Path(output_file)
         output_filepath.touch(exist_ok=True)
-        output_string = "\n".join([coverage_score, "", pretty_print])
+        output_string = "\n".join([result.summary(), "", pretty_print])
 
         output_filepath.write_text(output_string)
     elif show_report:
-        print(f"Found {len(results)-1} dependencies")
-        print(coverage_score)
+        print(f"Found {len(result.results)-1} dependencies")
+        print(result.summary())
         print(pretty_print)
 
-    if "coverage" in config and license_coverage < target_cov:
-        raise FAIL_UNDER
+    raise typer.Exit(code=result.exit_code)
+
 
-    raise OK
+def member_verdicts(
+    license_logger: LicenseLogger, policy: LicensePolicy, develop: bool
+) -> List[List[str]]:
+    """Judge every member of a uv workspace on the packages it uses.
+
+    The packages are looked up once, for the whole workspace.
+
+    Args:
+        license_logger: Logger of the uv.lock of the workspace
+        policy: Policy to judge the members by
+        develop: Whether development dependencies were included
+
+    Returns:
+        List[List[str]]: Packages, coverage and verdict of each member,
+        including the header row
+
+    Raises:
+        ValueError: If the dependency file is not a uv.lock
+    """
+    if (
+        license_logger.dependency_file is None
+        or license_logger.parser != DependencyFileParser.parse_uv_lock
+    ):
+        raise ValueError("Member verdicts need a uv.lock dependency file")
+    attribution = uv_member_attribution(license_logger.dependency_file, develop)
+    # Rows are matched by name, as transitive logs hold more rows than the
+    # dependency file has packages
+    users: Dict[str, List[str]] = {}
+    for key, names in attribution.items():
+        users.setdefault(canonicalize_name(key.split("/")[0]), []).extend(names)
+    table = license_logger.table()
+    rows: Dict[str, List[List[str]]] = {}
+    for row in table[1:]:
+        for member in dict.fromkeys(users.get(canonicalize_name(row[0]), [])):
+            rows.setdefault(member, []).append(row)
+    output = [MEMBER_HEADER]
+    for member, member_rows in sorted(rows.items()):
+        result = policy.check(table[:1] + member_rows)
+        output.append(
+            [
+                member,
+                str(len(member_rows)),
+                f"{result.coverage}%",
+                VERDICTS[result.exit_code],
+            ]
+        )
+    return output
+
+
+def watch_verdict(result: CheckResult, elapsed: float) -> str:
+    """Describe the verdict of a check in watch mode.
+
+    Args:
+        result: Verdict of the check
+        elapsed: Seconds the check took
+
+    Returns:
+        str: Summary of the check, followed by the packages not accepted
+    """
+    verdict = ["OK", "Banned licenses found", "Coverage below target"]
+    lines = [
+        f"[{time.strftime('%H:%M:%S')}] {verdict[result.exit_code]}: "
+        f"{len(result.results) - 1} packages, {result.summary()} "
+        f"({elapsed * 1000:.0f} ms)"
+    ]
+    rejected = [x for x in result.results[1:] if x[-1] not in ACCEPTED_STATUSES]
+    if rejected:
+        lines.append(
+            tabulate(
+                result.results[:1] + rejected,
+                tablefmt="pipe",
+                headers="firstrow",
+                disable_numparse=True,
+            )
+        )
+    return "\n".join(lines)
+
+
+def changed_dependency_files(
+    store: Inventory, dependency_files: List[str], policy: LicensePolicy, develop: bool
+) -> Dict[str, Tuple[str, List[str]]]:
+    """Parse the dependency files that changed since they were inventoried.
+
+    Args:
+        store: The inventory
+        dependency_files: Dependency files to inventory
+        policy: Policy the packages are validated against
+        develop: Whether to include development dependencies
+
+    Returns:
+        Dict[str, Tuple[str, List[str]]]: Digest and package keys of each
+        changed dependency file
+
+    Raises:
+        ValueError: If a dependency file is not supported
+    """
+    changed = {}
+    for path in dict.fromkeys(dependency_files):
+        parser = DependencyFileParser().resolve(Path(path).name)
+        if parser is None:
+            raise ValueError(f"Unsupported lock file: {Path(path).name}")
+        digest = file_digest(Path(path), policy.digest(), f"develop={develop}")
+        if store.digest(path) != digest:
+            changed[path] = (digest, parser(Path(path), develop=develop))
+    return changed
+
+
+def diff_row(
+    license_logger: LicenseLogger,
+    metadata: Dict[str, Any],
+    old_key: Optional[str],
+    new_key: Optional[str],
+) -> List[str]:
+    """Describe the change of a package between two dependency files.
+
+    Args:
+        license_logger: Logger the metadata was fetched with
+        metadata: The metadata of each package key
+        old_key: Package key in the old dependency file, if any
+        new_key: Package key in the new dependency file, if any
+
+    Returns:
+        List[str]: Name, change, old and new version, and old and new license
+    """
+    versions, licenses = ["", ""], ["", ""]
+    for i, key in enumerate((old_key, new_key)):
+        if key:
+            name, version, licenses[i] = license_logger.format_row(key, metadata[key])
+            versions[i] = key.partition("/")[2] or version
+
+    if old_key is None:
+        change = "Added"
+    elif new_key is None:
+        change = "Removed"
+    elif licenses[0] != licenses[1]:
+        change = "License changed"
+    else:
+        change = "Version changed"
+    return [name, change, *versions, *licenses]
+
+
+def write_shard_results(
+    shard_file: str, license_logger: LicenseLogger, results: List[List[str]]
+) -> None:
+    """Save the validated rows of a shard to a partial result file.
+
+    Every row is stored with the position of its package in the unsharded
+    dependency file, so merging reproduces the order of a single-process run.
+
+    Args:
+        shard_file: File to save the partial result in
+        license_logger: Sharded logger the results were produced with
+        results: Validated rows including the header row
+    """
+    positions: Dict[str, int] = {}
+    for position, package in enumerate(license_logger.packages(sharded=False)):
+        positions.setdefault(canonicalize_name(package.split("/")[0]), position)
+
+    rows = [
+        [positions.get(canonicalize_name(row[0]), len(positions)), row]
+        for row in results[1:]
+    ]
+    partial = {"shard": license_logger.shard, "header": results[0], "rows": rows}
+    Path(shard_file).write_text(json.dumps(partial, indent=2))
+
+
+def read_shard_results(shard_files: List[str]) -> List[List[str]]:
+    """Combine partial result files of a sharded check.
+
+    Shards resolving transitively each expand the dependencies of their own
+    packages, so a dependency shared by packages of several shards is kept
+    from the first shard that reported it only.
+
+    Args:
+        shard_files: Partial result files written by check --shard
+
+    Returns:
+        List[List[str]]: Validated rows including the header row
+
+    Raises:
+        ValueError: If the files do not make up one complete set of shards
+    """
+    partials = [json.loads(Path(x).read_text()) for x in shard_files]
+    counts = {partial["shard"][1] for partial in partials}
+    indices = sorted(partial["shard"][0] for partial in partials)
+    if len(counts) != 1 or indices != list(range(1, counts.pop() + 1)):
+        raise ValueError(f"Incomplete or inconsistent shards: {shard_files}")
+    headers = {tuple(partial["header"]) for partial in partials}
+    if len(headers) != 1:
+        raise ValueError("Shards were produced with different columns")
+
+    rows = sorted(
+        (
+            (position, partial["shard"][0], seq, row)
+            for partial in partials
+            for seq, (position, row) in enumerate(partial["rows"])
+        ),
+        key=lambda x: x[:3],
+    )
+    reported_by: Dict[str, int] = {}
+    merged = [list(headers.pop())]
+    for _, shard, _, row in rows:
+        if reported_by.setdefault(canonicalize_name(row[0]), shard) == shard:
+            merged.append(row)
+    return merged
 
 
 def validate_requirements(
@@ -181,6 +1288,8 @@ def validate_requirements(
 ) -> List[List[str]]:
     """Compare licenses to requirements.
 
+    Licenses already logged by the license logger are reused.
+
     Args:
         license_logger: File to crawl dependencies for
         allowed: Whether to include development dependencies
@@ -190,42 +1299,8 @@ def validate_requirements(
     Returns:
         List[List[str]]: Returns results of validation of license
     """
-    license_log = license_logger.log_licenses()
-    results = [license_log[0] + ["Status"]]
-    for lib in license_log[1:]:
-        # handle multiple licenses
-        for lib_license in lib[-1].split("\n"):
-            matches = None
-            row_info = [
-                lib_license if key.lower() == "license" else val
-                for val, key in zip(lib, license_log[0])
-            ]
-            if lib[0] in validated:
-                results.append(row_info + ["Manually validated"])
-                continue
-            if banned:
-                matches = get_close_matches(
-                    lib_license.lower().replace("license", ""), banned
-                )
-                if matches:
-                    results.append(row_info + ["Banned"])
-                    continue
-
-            if allowed:
-                matches = get_close_matches(
-                    lib_license.lower().replace("license", ""), allowed
-                )
-                if matches:
-                    results.append(row_info + ["Allowed"])
-
-                if not matches:
-                    results.append(row_info + ["Unknown"])
-
-            else:
-                if not matches:
-                    results.append(row_info + ["Allowed"])
-
-    return results
+    policy = LicensePolicy(frozenset(allowed), frozenset(banned), frozenset(validated))
+    return policy.validate(license_logger.table())
 
 
 if __name__ == "__main__":
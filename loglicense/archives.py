@@ -0,0 +1,264 @@
+"""Reading package metadata straight from distribution archives."""
+import json
+import logging
+import posixpath
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from email.parser import BytesHeaderParser
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from loglicense.sources import metadata_to_info
+
+
+logger = logging.getLogger("licenselogger")
+
+WHEEL_SUFFIXES = (".whl",)
+SDIST_SUFFIXES = (".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".zip")
+SITE_DIRS = ("site-packages", "dist-packages")
+WHITEOUT_PREFIX = ".wh."
+OPAQUE_WHITEOUT = ".wh..wh..opq"
+
+# Metadata of the packages installed by a layer, and the paths it deletes
+LayerContents = Tuple[Dict[str, Dict[str, Any]], List[str]]
+
+
+def _is_metadata_member(name: str) -> bool:
+    parts = name.split("/")
+    return len(parts) == 2 and (
+        (parts[0].endswith(".dist-info") and parts[1] == "METADATA")
+        or parts[1] == "PKG-INFO"
+    )
+
+
+def parse_core_metadata(content: bytes) -> Dict[str, Any]:
+    """Parse a METADATA/PKG-INFO file into a PyPI-like info dict.
+
+    Args:
+        content: Raw content of the metadata file
+
+    Returns:
+        Dict[str, Any]: The fields of the PyPI JSON API ``info`` object
+    """
+    return metadata_to_info(BytesHeaderParser().parsebytes(content))
+
+
+def read_archive_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """Read the core metadata of a wheel or sdist without extracting it.
+
+    Only the METADATA (wheels) or PKG-INFO (sdists) member is read.
+
+    Args:
+        path: Path to the archive
+
+    Returns:
+        Optional[Dict[str, Any]]: The metadata, ``None`` if not found
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if _is_metadata_member(name):
+                        return parse_core_metadata(archive.read(name))
+        else:
+            with tarfile.open(path, "r:*") as archive:
+                for member in archive:
+                    if member.isfile() and _is_metadata_member(member.name):
+                        fileobj = archive.extractfile(member)
+                        if fileobj is not None:
+                            return parse_core_metadata(fileobj.read())
+    except (OSError, tarfile.TarError, zipfile.BadZipFile):
+        logger.warning(f"{path}: error in reading archive")
+    return None
+
+
+def find_archives(directory: Path) -> List[Path]:
+    """List the wheels and sdists of a directory, such as a wheelhouse.
+
+    Args:
+        directory: Directory to search
+
+    Returns:
+        List[Path]: Paths of the archives, sorted by name
+    """
+    suffixes = WHEEL_SUFFIXES + SDIST_SUFFIXES
+    return sorted(
+        x for x in directory.iterdir() if x.is_file() and x.name.endswith(suffixes)
+    )
+
+
+def scan_wheelhouse(directory: Path, workers: int = 8) -> Dict[str, Dict[str, Any]]:
+    """Read the metadata of every archive in a directory.
+
+    Archives are read in a process pool, without extracting anything.
+    Archives of the same package version (such as wheels for several
+    platforms) are reported once.
+
+    Args:
+        directory: Directory of wheels and sdists
+        workers: Number of processes reading archives
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Metadata by ``name/version`` key
+    """
+    archives = [str(x) for x in find_archives(directory)]
+    if workers <= 1 or len(archives) <= 1:
+        found = [read_archive_metadata(x) for x in archives]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            found = list(executor.map(read_archive_metadata, archives, chunksize=8))
+
+    output: Dict[str, Dict[str, Any]] = {}
+    for info in found:
+        if info and info.get("name"):
+            output.setdefault(f"{info['name']}/{info['version']}", info)
+    return output
+
+
+def _member_path(name: str) -> str:
+    return posixpath.normpath(name).lstrip("/")
+
+
+def _read_member(archive: tarfile.TarFile, member: tarfile.TarInfo) -> bytes:
+    fileobj = archive.extractfile(member)
+    return fileobj.read() if fileobj is not None else b""
+
+
+def _is_installed_metadata(path: str) -> bool:
+    parts = path.split("/")
+    return (
+        len(parts) >= 3
+        and parts[-1] == "METADATA"
+        and parts[-2].endswith(".dist-info")
+        and parts[-3] in SITE_DIRS
+    )
+
+
+def _deleted_path(path: str) -> Optional[str]:
+    directory, base = posixpath.split(path)
+    if base == OPAQUE_WHITEOUT:
+        return f"{directory}/" if directory else ""
+    if base.startswith(WHITEOUT_PREFIX):
+        return posixpath.join(directory, base[len(WHITEOUT_PREFIX) :])
+    return None
+
+
+def scan_layer(layer: tarfile.TarFile) -> LayerContents:
+    """Read the installed packages and the whiteouts of a filesystem layer.
+
+    Args:
+        layer: Layer tar opened in streaming mode
+
+    Returns:
+        LayerContents: Metadata of the installed packages by path, and the
+        paths deleted from lower layers. Paths deleting the content of a
+        directory end with a slash.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    deleted: List[str] = []
+    for member in layer:
+        path = _member_path(member.name)
+        deleted_path = _deleted_path(path)
+        if deleted_path is not None:
+            deleted.append(deleted_path)
+        elif member.isfile() and _is_installed_metadata(path):
+            found[path] = parse_core_metadata(_read_member(layer, member))
+    return found, deleted
+
+
+def _apply_whiteouts(installed: Dict[str, Dict[str, Any]], deleted: List[str]) -> None:
+    for path in deleted:
+        prefix = path if path.endswith("/") or not path else f"{path}/"
+        for key in [x for x in installed if x == path or x.startswith(prefix)]:
+            del installed[key]
+
+
+def _scan_nested_layer(
+    image: tarfile.TarFile, member: tarfile.TarInfo
+) -> Optional[LayerContents]:
+    fileobj = image.extractfile(member)
+    if fileobj is None:
+        return None
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as layer:
+            return scan_layer(layer)
+    except tarfile.TarError:
+        return None
+
+
+def _image_layers(path: Path) -> List[LayerContents]:
+    """Read the layers of an image tarball in one streaming pass.
+
+    Args:
+        path: Path to the tarball
+
+    Returns:
+        List[LayerContents]: The contents of the layers, lowest first. Only
+        the tarball itself, as a flat tree, without a ``manifest.json`` or
+        OCI ``index.json``.
+    """
+    root: LayerContents = ({}, [])
+    layers: Dict[str, LayerContents] = {}
+    aliases: Dict[str, str] = {}
+    order: List[str] = []
+    indexed = False
+    with tarfile.open(path, "r|*") as image:
+        for member in image:
+            name = _member_path(member.name)
+            if member.issym():
+                target = posixpath.join(posixpath.dirname(name), member.linkname)
+                aliases[name] = _member_path(target)
+            elif not member.isfile():
+                continue
+            elif name == "manifest.json":
+                manifest = json.loads(_read_member(image, member))
+                order = [_member_path(x) for x in manifest[0]["Layers"]]
+                indexed = True
+            elif name == "index.json":
+                indexed = True
+            elif _is_installed_metadata(name):
+                root[0][name] = parse_core_metadata(_read_member(image, member))
+            elif name.endswith(".tar") or name.startswith("blobs/"):
+                contents = _scan_nested_layer(image, member)
+                if contents is not None:
+                    layers[name] = contents
+
+    # The manifest may come after the layers, so nested tarballs are scanned
+    # before knowing whether they are layers or plain files of a tree
+    if not indexed:
+        return [root]
+    order = [aliases.get(x, x) for x in order] or list(layers)
+    return [root] + [layers[x] for x in order if x in layers]
+
+
+def scan_image(path: Path, workers: int = 8) -> Dict[str, Dict[str, Any]]:
+    """Read the metadata of the packages installed in an image tarball.
+
+    Handles tarballs written by ``docker save`` as well as plain tarballs of
+    a filesystem or virtual environment. The tarball and its layers are read
+    in streaming mode, without extracting anything, so memory use does not
+    grow with the size of the image. Layers are applied in order, honouring
+    the whiteouts that delete files of lower layers.
+
+    Args:
+        path: Path to the tarball
+        workers: Unused, layers are read in a single sequential pass
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Metadata by ``name/version`` key
+    """
+    installed: Dict[str, Dict[str, Any]] = {}
+    for found, deleted in _image_layers(path):
+        _apply_whiteouts(installed, deleted)
+        installed.update(found)
+
+    output: Dict[str, Dict[str, Any]] = {}
+    for info in installed.values():
+        if info.get("name"):
+            output.setdefault(f"{info['name']}/{info['version']}", info)
+    return output
@@ -0,0 +1,375 @@
+"""Persistent state shared between loglicense runs."""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from packaging.utils import canonicalize_name
+
+
+logger = logging.getLogger("licenselogger")
+
+
+def default_cache_dir() -> Path:
+    """Locate the directory loglicense keeps its state in.
+
+    Honours ``LOGLICENSE_CACHE_DIR`` and otherwise follows the XDG base
+    directory convention.
+
+    Returns:
+        Path: Directory for cached state (not necessarily existing)
+    """
+    if os.environ.get("LOGLICENSE_CACHE_DIR"):
+        return Path(os.environ["LOGLICENSE_CACHE_DIR"])
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache) / "loglicense"
+
+
+class FetchTimings:
+    """History of fetch latency and response size per package.
+
+    Used to schedule fetches longest-processing-time-first, so a slow package
+    does not end up starting last and dominating the wall time of a run.
+
+    Args:
+        path: JSON file to load and save the history from. Keeps the history
+            in memory only when not given.
+        smoothing: Weight of a new observation in the moving average
+
+    """
+
+    def __init__(self, path: Optional[Path] = None, smoothing: float = 0.5):
+        super().__init__()
+        self.path = path
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._changed = False
+        self._history: Dict[str, Tuple[float, int]] = {}
+
+        if self.path is not None and self.path.is_file():
+            try:
+                self._history = {
+                    key: (float(latency), int(size))
+                    for key, (latency, size) in json.loads(
+                        self.path.read_text()
+                    ).items()
+                }
+            except (OSError, ValueError, TypeError):
+                logger.warning(f"{self.path}: ignoring unreadable fetch timings")
+
+    def record(self, key: str, latency: float, size: int) -> None:
+        """Record an observed fetch.
+
+        Args:
+            key: Package key (``name`` or ``name/version``)
+            latency: Wall time of the fetch in seconds
+            size: Size of the response in bytes
+        """
+        with self._lock:
+            if key in self._history:
+                old_latency, _ = self._history[key]
+                latency = old_latency + self.smoothing * (latency - old_latency)
+            self._history[key] = (latency, size)
+            self._changed = True
+
+    def estimate(self, key: str) -> Optional[Tuple[float, int]]:
+        """Look up the expected latency and response size of a fetch.
+
+        Args:
+            key: Package key (``name`` or ``name/version``)
+
+        Returns:
+            Optional[Tuple[float, int]]: Latency in seconds and size in bytes,
+            or ``None`` if the package has never been fetched
+        """
+        with self._lock:
+            return self._history.get(key)
+
+    def schedule(self, keys: Iterable[str]) -> List[str]:
+        """Order keys longest-processing-time-first.
+
+        Packages without history are scheduled first, as nothing bounds how
+        long they take. The others follow by decreasing latency, with the
+        response size breaking ties.
+
+        Args:
+            keys: Package keys to fetch
+
+        Returns:
+            List[str]: The keys in the order they should be submitted
+        """
+        estimates = {key: self.estimate(key) for key in keys}
+        unknown = [key for key, value in estimates.items() if value is None]
+        known = [key for key, value in estimates.items() if value is not None]
+        known.sort(key=lambda key: estimates[key] or (0.0, 0), reverse=True)
+        return unknown + known
+
+    def save(self) -> None:
+        """Write the history back to disk, if anything was recorded."""
+        if self.path is None or not self._changed:
+            return
+        with self._save_lock:
+            with self._lock:
+                history = dict(self._history)
+                self._changed = False
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text(json.dumps(history, sort_keys=True))
+            except OSError:
+                logger.warning(f"{self.path}: could not save fetch timings")
+
+
+class CacheEntry(NamedTuple):
+    """A cached metadata lookup.
+
+    Args:
+        metadata: The metadata of the library
+        fetched: Unix time the metadata was fetched at
+
+    """
+
+    metadata: Any
+    fetched: float
+
+
+def cache_key(libname: str) -> str:
+    """Normalise a package key for cache lookups.
+
+    Args:
+        libname: Package key (``name`` or ``name/version``)
+
+    Returns:
+        str: The key with a canonicalized package name
+    """
+    name, _, version = libname.partition("/")
+    return (
+        f"{canonicalize_name(name)}/{version}" if version else canonicalize_name(name)
+    )
+
+
+class MetadataCache:
+    """Persistent cache of package metadata.
+
+    Metadata of pinned packages (``name/version``) does not change and never
+    expires, while unpinned lookups are considered fresh for ``ttl`` seconds.
+    Until ``hard_ttl`` seconds, expired unpinned lookups can still be served
+    while they are refreshed in the background.
+    Packages the index does not have are cached as ``None`` metadata, fresh
+    for ``negative_ttl`` seconds, so they are not looked up on every run.
+    The cache can be exported to and imported from a compact, versioned
+    bundle, to move it onto machines without network access.
+
+    Args:
+        path: JSON file to load and save the cache from. Keeps the cache
+            in memory only when not given.
+        ttl: Seconds an unpinned lookup is considered fresh
+        negative_ttl: Seconds a package not found is considered missing
+        hard_ttl: Seconds after which an unpinned lookup can no longer be
+            served stale and must be refetched before use
+        max_entries: Most packages kept, the least recently stored ones are
+            evicted first. Unbounded when not given.
+
+    """
+
+    BUNDLE_FORMAT = "loglicense-cache"
+    BUNDLE_VERSION = 1
+    # Not used for license logging and by far the largest field on PyPI
+    OMITTED_FIELDS = ("description",)
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = 86400.0,
+        negative_ttl: float = 3600.0,
+        hard_ttl: float = 604800.0,
+        max_entries: Optional[int] = None,
+    ):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hard_ttl = hard_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._changed = False
+        self._entries: Dict[str, CacheEntry] = {}
+
+        if self.path is not None and self.path.is_file():
+            try:
+                self._entries = self._load_entries(json.loads(self.path.read_text()))
+            except (OSError, ValueError, TypeError, KeyError):
+                logger.warning(f"{self.path}: ignoring unreadable metadata cache")
+
+    def __len__(self) -> int:
+        """Number of cached packages.
+
+        Returns:
+            int: Number of cached packages
+        """
+        return len(self._entries)
+
+    @staticmethod
+    def _load_entries(raw: Dict[str, Any]) -> Dict[str, CacheEntry]:
+        return {
+            key: CacheEntry(entry["metadata"], float(entry["fetched"]))
+            for key, entry in raw.items()
+        }
+
+    def lookup(self, libname: str) -> Optional[CacheEntry]:
+        """Look up the cached metadata of a package, fresh or not.
+
+        Args:
+            libname: Package key (``name`` or ``name/version``)
+
+        Returns:
+            Optional[CacheEntry]: The cached entry, ``None`` if not cached
+        """
+        with self._lock:
+            return self._entries.get(cache_key(libname))
+
+    def is_fresh(self, libname: str, entry: CacheEntry) -> bool:
+        """Check whether a cached entry can be used without refetching.
+
+        Args:
+            libname: Package key (``name`` or ``name/version``)
+            entry: The cached entry of the package
+
+        Returns:
+            bool: Whether the entry is fresh
+        """
+        age = time.time() - entry.fetched
+        if entry.metadata is None:
+            return age < self.negative_ttl
+        if "/" in libname:
+            return True
+        return age < self.ttl
+
+    def is_revalidatable(self, libname: str, entry: CacheEntry) -> bool:
+        """Check whether an expired entry can be served while it is refreshed.
+
+        Args:
+            libname: Package key (``name`` or ``name/version``)
+            entry: The cached entry of the package
+
+        Returns:
+            bool: Whether the entry is within its hard expiry
+        """
+        if entry.metadata is None or "/" in libname:
+            return False
+        return time.time() - entry.fetched < self.hard_ttl
+
+    def store(self, libname: str, metadata: Any) -> None:
+        """Store the metadata of a package.
+
+        Args:
+            libname: Package key (``name`` or ``name/version``)
+            metadata: The metadata of the library, ``None`` if not found
+        """
+        if isinstance(metadata, dict):
+            metadata = {
+                k: v for k, v in metadata.items() if k not in self.OMITTED_FIELDS
+            }
+        with self._lock:
+            key = cache_key(libname)
+            # Stored again, the entry moves last in line for eviction
+            self._entries.pop(key, None)
+            self._entries[key] = CacheEntry(metadata, time.time())
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._changed = True
+
+    def merge(self, entries: Dict[str, CacheEntry]) -> int:
+        """Merge entries into the cache, keeping the most recent of each.
+
+        Args:
+            entries: Cached entries by package key
+
+        Returns:
+            int: Number of entries added or updated
+        """
+        updated = 0
+        with self._lock:
+            for key, entry in entries.items():
+                current = self._entries.get(key)
+                if current is None or current.fetched < entry.fetched:
+                    self._entries[key] = entry
+                    updated += 1
+            self._changed = self._changed or bool(updated)
+        return updated
+
+    def _serialize(self, saving: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            # Stores after the snapshot mark the cache as changed again
+            if saving:
+                self._changed = False
+            return {key: entry._asdict() for key, entry in self._entries.items()}
+
+    def save(self) -> None:
+        """Write the cache back to disk, if anything changed."""
+        if self.path is None or not self._changed:
+            return
+        # Concurrent saves would write the same temporary file
+        with self._save_lock:
+            entries = self._serialize(saving=True)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(entries, separators=(",", ":")))
+                tmp_path.replace(self.path)
+            except OSError:
+                logger.warning(f"{self.path}: could not save metadata cache")
+
+    def export_bundle(self, bundle: Path) -> int:
+        """Write the cache to a gzip compressed, versioned bundle.
+
+        Args:
+            bundle: File to write the bundle to
+
+        Returns:
+            int: Number of exported entries
+        """
+        entries = self._serialize()
+        payload = {
+            "format": self.BUNDLE_FORMAT,
+            "version": self.BUNDLE_VERSION,
+            "created": time.time(),
+            "entries": entries,
+        }
+        with gzip.open(bundle, "wt", encoding="utf-8") as bundle_file:
+            json.dump(payload, bundle_file, separators=(",", ":"))
+        return len(entries)
+
+    def import_bundle(self, bundle: Path) -> int:
+        """Merge a bundle written by :meth:`export_bundle` into the cache.
+
+        Args:
+            bundle: File to read the bundle from
+
+        Returns:
+            int: Number of entries added or updated
+
+        Raises:
+            ValueError: If the file is not a supported cache bundle
+        """
+        with gzip.open(bundle, "rt", encoding="utf-8") as bundle_file:
+            payload = json.load(bundle_file)
+        if payload.get("format") != self.BUNDLE_FORMAT:
+            raise ValueError(f"{bundle} is not a loglicense cache bundle")
+        if payload.get("version") != self.BUNDLE_VERSION:
+            raise ValueError(
+                f"Unsupported cache bundle version {payload.get('version')}"
+            )
+        return self.merge(self._load_entries(payload["entries"]))
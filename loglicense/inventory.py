@@ -0,0 +1,207 @@
+"""License inventories of many dependency files, kept in SQLite."""
+import hashlib
+import sqlite3
+from pathlib import Path
+from types import TracebackType
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Type
+
+
+# Package names, versions, licenses and statuses are dictionary encoded: every
+# distinct string is stored once in ``strings`` and referenced by its id.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    repo INTEGER NOT NULL REFERENCES repos (id),
+    package INTEGER NOT NULL REFERENCES strings (id),
+    version INTEGER NOT NULL REFERENCES strings (id),
+    license INTEGER NOT NULL REFERENCES strings (id),
+    status INTEGER NOT NULL REFERENCES strings (id)
+);
+CREATE INDEX IF NOT EXISTS entries_repo ON entries (repo);
+CREATE INDEX IF NOT EXISTS entries_package ON entries (package);
+CREATE INDEX IF NOT EXISTS entries_license ON entries (license);
+CREATE VIEW IF NOT EXISTS inventory AS
+SELECT
+    repos.path AS repo,
+    package.value AS package,
+    version.value AS version,
+    license.value AS license,
+    status.value AS status
+FROM entries
+JOIN repos ON repos.id = entries.repo
+JOIN strings AS package ON package.id = entries.package
+JOIN strings AS version ON version.id = entries.version
+JOIN strings AS license ON license.id = entries.license
+JOIN strings AS status ON status.id = entries.status;
+"""
+
+#: Columns of the rows stored in and queried from an inventory
+INVENTORY_HEADER = ["Repo", "Name", "Version", "License", "Status"]
+
+
+def file_digest(path: Path, *salt: str) -> str:
+    """Fingerprint a dependency file and the settings it was checked with.
+
+    Args:
+        path: Path to the dependency file
+        *salt: Settings that change the outcome, such as the policy
+
+    Returns:
+        str: Hex digest of the content and the settings
+    """
+    digest = hashlib.sha256(path.read_bytes())
+    for value in salt:
+        digest.update(b"\0" + value.encode())
+    return digest.hexdigest()
+
+
+class Inventory:
+    """Validated packages of many dependency files in a SQLite database.
+
+    Each dependency file is stored with a digest, so that runs over many
+    files only replace the files that changed. The decoded rows can also be
+    queried with SQL through the ``inventory`` view.
+
+    Args:
+        path: Path to the database, created if missing
+
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+        self._ids: Dict[str, int] = {
+            value: id_
+            for id_, value in self._connection.execute("SELECT id, value FROM strings")
+        }
+
+    def __enter__(self) -> "Inventory":
+        """Use the inventory as a context manager.
+
+        Returns:
+            Inventory: The inventory itself
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the database.
+
+        Args:
+            exc_type: Type of the exception raised in the block, if any
+            exc_value: Exception raised in the block, if any
+            traceback: Traceback of the exception, if any
+        """
+        self.close()
+
+    def digest(self, repo: str) -> Optional[str]:
+        """Look up the digest a dependency file was stored with.
+
+        Args:
+            repo: Path of the dependency file
+
+        Returns:
+            Optional[str]: The digest, ``None`` if the file is not stored
+        """
+        row = self._connection.execute(
+            "SELECT digest FROM repos WHERE path = ?", (repo,)
+        ).fetchone()
+        return str(row[0]) if row else None
+
+    def replace(self, repo: str, digest: str, rows: List[List[str]]) -> None:
+        """Store the validated packages of a dependency file.
+
+        Rows stored earlier for the file are replaced.
+
+        Args:
+            repo: Path of the dependency file
+            digest: Digest of the dependency file
+            rows: Name, version, license and status of each package, without
+                a header row
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO repos (path, digest) VALUES (?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET digest = excluded.digest",
+                (repo, digest),
+            )
+            (repo_id,) = self._connection.execute(
+                "SELECT id FROM repos WHERE path = ?", (repo,)
+            ).fetchone()
+            self._connection.execute("DELETE FROM entries WHERE repo = ?", (repo_id,))
+            ids = self._intern(value for row in rows for value in row)
+            self._connection.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                ([repo_id] + [ids[x] for x in row] for row in rows),
+            )
+
+    def query(
+        self, lib_license: Optional[str] = None, name: Optional[str] = None
+    ) -> List[List[str]]:
+        """Find the dependency files using packages or licenses.
+
+        Matching is case insensitive on a substring, so ``GPL`` matches
+        ``AGPL`` and ``LGPL`` too.
+
+        Args:
+            lib_license: Part of the license to look for
+            name: Part of the package name to look for
+
+        Returns:
+            List[List[str]]: Repo, name, version, license and status of the
+            matching packages
+        """
+        conditions, parameters = [], []
+        for column, value in (("license", lib_license), ("package", name)):
+            if value is not None:
+                # Matching the small strings table first lets the index on
+                # the entries find the rows
+                conditions.append(
+                    f"entries.{column} IN "
+                    "(SELECT id FROM strings WHERE value LIKE ?)"
+                )
+                parameters.append(f"%{value}%")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            "SELECT repos.path, package.value, version.value, license.value, "
+            "status.value FROM entries "
+            "JOIN repos ON repos.id = entries.repo "
+            "JOIN strings AS package ON package.id = entries.package "
+            "JOIN strings AS version ON version.id = entries.version "
+            "JOIN strings AS license ON license.id = entries.license "
+            "JOIN strings AS status ON status.id = entries.status "
+            f"{where} ORDER BY repos.path, package.value",
+            parameters,
+        )
+        return [list(row) for row in rows]
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def _intern(self, values: Iterable[str]) -> Dict[str, int]:
+        for value in set(values) - self._ids.keys():
+            self._connection.execute(
+                "INSERT OR IGNORE INTO strings (value) VALUES (?)", (value,)
+            )
+            (self._ids[value],) = self._connection.execute(
+                "SELECT id FROM strings WHERE value = ?", (value,)
+            ).fetchone()
+        return self._ids
@@ -0,0 +1,230 @@
+"""Reading members of a JSON object from a stream, without decoding the rest."""
+import json
+import re
+import time
+from typing import IO
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+from loglicense.trace import span
+
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+# Rest of a string after its opening quote, up to and including the closing one
+_STRING_TAIL = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_STRUCTURE = re.compile(rb'["\[\]{}]')
+_SCALAR_END = re.compile(rb"[,}\]\s]")
+
+
+class JsonMemberReader:
+    """Reads selected members of the top-level JSON object of a stream.
+
+    The stream is read in chunks and only the wanted members, or elements of
+    them, are decoded.
+    Other members are skipped without building objects, keeping only the
+    current chunk in memory, and reading stops as soon as all wanted
+    members were found.
+
+    Args:
+        stream: Binary stream of a JSON object
+        max_size: Most bytes to read, ``None`` for no limit
+        chunk_size: Bytes to read at a time
+        deadline: Monotonic time after which reading fails, checked before
+            each chunk, if any
+
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        max_size: Optional[int] = None,
+        chunk_size: int = 65536,
+        deadline: Optional[float] = None,
+    ):
+        super().__init__()
+        self.stream = stream
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.deadline = deadline
+        #: Number of bytes read from the stream
+        self.size = 0
+        self._buffer = b""
+        self._pos = 0
+        self._mark: Optional[int] = None
+        self._eof = False
+
+    def read_members(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Decode members of the object, stopping once all were found.
+
+        Args:
+            keys: Names of the members to decode
+
+        Returns:
+            Dict[str, Any]: The members found, by name
+
+        Raises:
+            ValueError: If the stream is not a JSON object or too large
+            TimeoutError: If the deadline passes while reading
+        """
+        wanted = set(keys)
+        found: Dict[str, Any] = {}
+        if not wanted:
+            return found
+        for key in self._members():
+            if key in wanted:
+                raw = self._capture(self._skip_value)
+                with span("decode", member=key, size=len(raw)):
+                    found[key] = json.loads(raw)
+                if not wanted - found.keys():
+                    break
+            else:
+                self._skip_value()
+        return found
+
+    def iter_items(self, keys: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """Decode the elements of array members of the object one at a time.
+
+        Only one element is held in memory at a time, however long the
+        array. Wanted members that are not arrays are decoded whole.
+
+        Args:
+            keys: Names of the members to decode
+
+        Yields:
+            Tuple[str, Any]: Name of the member and an element of it
+        """
+        wanted = set(keys)
+        for key in self._members():
+            if key not in wanted:
+                self._skip_value()
+            elif self._peek() != b"[":
+                yield key, json.loads(self._capture(self._skip_value))
+            else:
+                self._pos += 1
+                while True:
+                    self._skip_whitespace()
+                    if self._peek() == b"]":
+                        self._pos += 1
+                        break
+                    if self._peek() == b",":
+                        self._pos += 1
+                        continue
+                    yield key, json.loads(self._capture(self._skip_value))
+
+    def _members(self) -> Iterator[str]:
+        # Yields the name of each member, positioned at its value, which the
+        # consumer must read or skip before the next member
+        self._expect(b"{")
+        while True:
+            self._skip_whitespace()
+            if self._peek() == b"}":
+                return
+            if self._peek() == b",":
+                self._pos += 1
+                continue
+            key = json.loads(self._capture(self._skip_string))
+            self._skip_whitespace()
+            self._expect(b":")
+            self._skip_whitespace()
+            yield key
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        keep = self._pos if self._mark is None else self._mark
+        if self._mark is not None:
+            self._mark -= keep
+        self._buffer = self._buffer[keep:]
+        self._pos -= keep
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError("Deadline reached while reading")
+        chunk = self.stream.read(self.chunk_size)
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise ValueError(f"Response larger than {self.max_size} bytes")
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _peek(self) -> bytes:
+        while self._pos >= len(self._buffer):
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON")
+        return self._buffer[self._pos : self._pos + 1]
+
+    def _expect(self, char: bytes) -> None:
+        self._skip_whitespace()
+        if self._peek() != char:
+            raise ValueError(f"Expected {char.decode()} at byte {self._pos}")
+        self._pos += 1
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            match = _WHITESPACE.match(self._buffer, self._pos)
+            self._pos = match.end() if match else self._pos
+            if self._pos < len(self._buffer) or not self._fill():
+                return
+
+    def _capture(self, skip: Callable[[], None]) -> bytes:
+        self._mark = self._pos
+        try:
+            skip()
+            return self._buffer[self._mark : self._pos]
+        finally:
+            self._mark = None
+
+    def _skip_string(self) -> None:
+        if self._peek() != b'"':
+            raise ValueError(f"Expected string at byte {self._pos}")
+        while True:
+            match = _STRING_TAIL.match(self._buffer, self._pos + 1)
+            if match:
+                self._pos = match.end()
+                return
+            if not self._fill():
+                raise ValueError("Unterminated string in JSON")
+
+    def _skip_value(self) -> None:
+        first = self._peek()
+        if first == b'"':
+            self._skip_string()
+        elif first in (b"{", b"["):
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def _skip_container(self) -> None:
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self._buffer, self._pos)
+            if not match:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON")
+                continue
+            self._pos = match.start()
+            char = match.group()
+            if char == b'"':
+                self._skip_string()
+                continue
+            self._pos += 1
+            depth += 1 if char in (b"{", b"[") else -1
+            if depth == 0:
+                return
+
+    def _skip_scalar(self) -> None:
+        while True:
+            match = _SCALAR_END.search(self._buffer, self._pos)
+            if match:
+                self._pos = match.start()
+                return
+            self._pos = len(self._buffer)
+            if not self._fill():
+                return
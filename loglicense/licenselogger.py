@@ -1,52 +1,196 @@
 """LogLicence main module."""
-import json
+import atexit
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Mapping
 from typing import Optional
-from urllib.request import urlopen
+from typing import Set
+from typing import Tuple
 
+from packaging.utils import canonicalize_name
+
+from loglicense.archives import scan_image
+from loglicense.archives import scan_wheelhouse
+from loglicense.cache import FetchTimings
+from loglicense.cache import MetadataCache
+from loglicense.cache import default_cache_dir
+from loglicense.policy import UNRESOLVED_LICENSE
+from loglicense.sbom import read_sbom
+from loglicense.sources import DEFAULT_SOURCES
+from loglicense.sources import MAX_RESPONSE_SIZE
+from loglicense.sources import AnswerCallback
+from loglicense.sources import CacheSource
+from loglicense.sources import IndexSource
+from loglicense.sources import MetadataSource
+from loglicense.sources import PrivateSource
+from loglicense.sources import StaticSource
+from loglicense.sources import build_sources
+from loglicense.sources import time_left
+from loglicense.trace import span
 from loglicense.utils import DependencyFileParser
+from loglicense.utils import active_requirements
+from loglicense.utils import in_shard
+from loglicense.utils import package_key
+from loglicense.wheels import needs_deep_license
+from loglicense.wheels import wheel_license
 
 
 logger = logging.getLogger("licenselogger")
 
+#: Most seconds the interpreter waits at exit for background refreshes
+REFRESH_EXIT_TIMEOUT = 0.5
+
+#: Most answers a logger keeps in memory
+MEMORY_CACHE_SIZE = 4096
+
+SCANNERS: Dict[str, Callable[[Path, int], Mapping[str, Optional[Dict[str, Any]]]]] = {
+    "wheelhouse": scan_wheelhouse,
+    "image-tar": scan_image,
+    "sbom": read_sbom,
+}
+
+
+@dataclass(frozen=True)
+class PackageLicense:
+    """License of a package resolved by :meth:`LicenseLogger.resolve_many`.
+
+    Args:
+        key: Package key (``name`` or ``name/version``)
+        name: Name of the package
+        version: Version of the package, empty if unknown
+        licenses: Licenses of the package, empty if none were found
+        found: Whether metadata of the package was found
+        unresolved: Whether the lookup was abandoned at the deadline
+
+    """
+
+    key: str
+    name: str
+    version: str
+    licenses: Tuple[str, ...]
+    found: bool
+    unresolved: bool = False
+
 
 class LicenseLogger:
     """Main module for logging licenses.
 
     Args:
-        dependency_file: File to crawl dependencies for
+        dependency_file: File to crawl dependencies for. Not needed to
+            resolve packages given in memory with :meth:`resolve_many`.
         package_manager: Which type of package manager to evaluate.
             Defaults to pypi for python.
         info_columns: Information to include in table to log
         develop: Whether to include development dependencies
+        shard: Only log the packages of shard ``(index, count)``, with a
+            1-based index. Defaults to all packages.
+        workers: Initial number of packages to fetch concurrently
+        cache_dir: Directory to keep state between runs in, such as fetch
+            timings and cached metadata. Defaults to the user cache directory.
+        offline: Only use cached metadata, packages missing from the cache
+            are reported as not found
+        sources: Ordered metadata sources, each ``installed``, ``cache``,
+            ``pypi`` or the base URL of a PyPI JSON API mirror. Defaults to
+            the cache followed by PyPI.
+        deep_license: Read the license files of a wheel of packages whose
+            metadata lacks a usable license, using HTTP range requests
+        dependency_source: What ``dependency_file`` is: ``file`` for a
+            dependency file, ``wheelhouse`` for a directory of wheels and
+            sdists whose metadata is read from the archives themselves,
+            ``image-tar`` for a ``docker save`` or virtual environment
+            tarball whose installed packages are read, or ``sbom`` for a
+            CycloneDX or SPDX SBOM or pip inspect report whose licenses are
+            used as is. SBOMs given as a dependency file are read as ``sbom``.
+        transitive: Also log the dependencies of the packages, recursively,
+            based on the ``requires_dist`` of their metadata
+        environment: Marker variables of the target environment used to
+            select transitive dependencies, such as ``python_version``.
+            Defaults to the running interpreter.
+        deadline: Seconds, from the start of each lookup, after which its
+            outstanding fetches are abandoned and their packages reported as
+            unresolved
+        private: Preset license by name pattern of private packages, which
+            are never looked up
+        negative_ttl: Seconds packages not found on an index are cached as
+            missing
+        max_response_size: Most bytes read from an index response
+        hard_ttl: Seconds cached unpinned lookups are served after they
+            expired, while being refreshed in the background. Older entries
+            are fetched again before use.
+        locked: Metadata recorded in a license lock by package key, answered
+            before any other source
 
     """
 
     def __init__(
         self,
-        dependency_file: str,
+        dependency_file: Optional[str] = None,
         package_manager: str = "pypi",
         info_columns: Optional[List[str]] = None,
         develop: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
+        workers: int = 8,
+        cache_dir: Optional[str] = None,
+        offline: bool = False,
+        sources: Optional[List[str]] = None,
+        deep_license: bool = False,
+        dependency_source: str = "file",
+        transitive: bool = False,
+        environment: Optional[Dict[str, str]] = None,
+        deadline: Optional[float] = None,
+        private: Optional[Dict[str, str]] = None,
+        negative_ttl: float = 3600.0,
+        max_response_size: Optional[int] = MAX_RESPONSE_SIZE,
+        hard_ttl: float = 604800.0,
+        locked: Optional[Dict[str, Dict[str, Any]]] = None,
     ):
         super().__init__()
-        self.dependency_file = Path(dependency_file)
+        self.dependency_file = Path(dependency_file) if dependency_file else None
         self.package_manager = package_manager
         self.info_columns = info_columns if info_columns else ["name", "license"]
+        self.shard = shard
+        self.workers = workers
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.timings = FetchTimings(self.cache_dir / "timings.json")
+        self.cache = MetadataCache(
+            self.cache_dir / "metadata.json",
+            negative_ttl=negative_ttl,
+            hard_ttl=hard_ttl,
+        )
+        self.offline = offline
+        self.deep_license = deep_license and not offline
+        self.dependency_source = dependency_source
+        self.transitive = transitive
+        self.environment = environment
+        self.deadline = deadline
+        #: Packages whose latest lookup was abandoned at the deadline
+        self.unresolved: Set[str] = set()
+        self._unresolved_lock = threading.Lock()
+        self.scanned = StaticSource()
+        self.locked = StaticSource(dict(locked or {}))
+        # Answers kept in memory expire like the cache, so long-lived loggers
+        # see license changes of unpinned packages, and are bounded so they
+        # do not grow without limit
+        self.resolved = CacheSource(
+            MetadataCache(ttl=self.cache.ttl, max_entries=MEMORY_CACHE_SIZE)
+        )
         self._parser_args = {"develop": develop}
-
-        if not self.dependency_file.is_file():
-            raise ValueError("Path must be a file")
-
-        parser = DependencyFileParser().resolve(self.dependency_file.name)
-        if parser is None:
-            raise ValueError(
-                f"Unsupported lock file: {self.dependency_file.name}"
-            )
-        self.parser = parser
+        self.parser = (
+            self._resolve_parser(self.dependency_file)
+            if self.dependency_file is not None
+            else None
+        )
 
         if self.package_manager == "pypi":
             self.library_url = "https://pypi.python.org/pypi/XXX/json"
@@ -55,79 +199,550 @@ class LicenseLogger:
         else:
             raise NotImplementedError("Only supports pypi dependencies")
 
+        self.private = private
+        self.max_response_size = max_response_size
+        self._refreshes: List[threading.Thread] = []
+        self._refreshing: Set[str] = set()
+        self._refresh_lock = threading.Lock()
+        self.sources = self._build_sources(sources or DEFAULT_SOURCES)
+
+    def _resolve_parser(self, dependency_file: Path) -> Callable[..., List[str]]:
+        """Pick the parser of the dependency file.
+
+        Args:
+            dependency_file: File to crawl dependencies for
+
+        Returns:
+            Callable[..., List[str]]: The parser of the dependency file
+
+        Raises:
+            ValueError: If the dependency file is missing or not supported
+        """
+        if self.dependency_source in SCANNERS:
+            if not dependency_file.exists():
+                raise ValueError(f"Path does not exist: {dependency_file}")
+            return self._scan
+        if self.dependency_source != "file":
+            raise ValueError(f"Unsupported dependency source: {self.dependency_source}")
+        if not dependency_file.is_file():
+            raise ValueError("Path must be a file")
+        parser = DependencyFileParser().resolve(dependency_file.name)
+        if parser is None:
+            raise ValueError(f"Unsupported lock file: {dependency_file.name}")
+        if parser == DependencyFileParser.parse_bom_json:
+            # Use the licenses of the SBOM instead of only its package list
+            self.dependency_source = "sbom"
+            return self._scan
+        return parser
+
+    def _build_sources(self, specs: List[str]) -> List[MetadataSource]:
+        """Build the source chain, after archives, locks, answers and private packages.
+
+        Args:
+            specs: Ordered metadata sources
+
+        Returns:
+            List[MetadataSource]: The metadata sources in order
+        """
+        sources: List[MetadataSource] = [self.scanned, self.locked, self.resolved]
+        if self.private:
+            sources.append(PrivateSource(self.private))
+        sources.extend(build_sources(specs, self.cache, self.workers, self.timings))
+        if self.offline:
+            sources = [x for x in sources if not x.remote]
+            for source in sources:
+                if isinstance(source, CacheSource):
+                    source.stale = True
+        for index, source in enumerate(sources):
+            if isinstance(source, (IndexSource, CacheSource)):
+                source.wheel_urls = self.deep_license
+            if isinstance(source, IndexSource):
+                source.max_response_size = self.max_response_size
+            refreshers = [x for x in sources[index + 1 :] if isinstance(x, IndexSource)]
+            if (
+                isinstance(source, CacheSource)
+                and source is not self.resolved
+                and refreshers
+                and not self.offline
+            ):
+                source.revalidate = partial(self._revalidate, refreshers)
+        return sources
+
+    def packages(self, sharded: bool = True) -> List[str]:
+        """Parse the packages of the dependency file.
+
+        Args:
+            sharded: Whether to restrict the packages to the configured shard
+
+        Returns:
+            List[str]: Package keys (``name`` or ``name/version``) in file order
+
+        Raises:
+            ValueError: If no dependency file was given
+        """
+        if self.dependency_file is None or self.parser is None:
+            raise ValueError("No dependency file given")
+        with span("parse", file=str(self.dependency_file)):
+            packages = self.parser(self.dependency_file, **self._parser_args)
+        if sharded and self.shard is not None:
+            index, count = self.shard
+            packages = [x for x in packages if in_shard(x, index, count)]
+        return packages
+
+    def _scan(self, path: Path, **kwargs: Any) -> List[str]:
+        """Read the packages and their metadata from archives or an SBOM.
+
+        Packages without metadata are left to the metadata sources.
+
+        Args:
+            path: Path to scan
+            **kwargs: Parser arguments, unused
+
+        Returns:
+            List[str]: Package keys of the packages found
+        """
+        scanned = SCANNERS[self.dependency_source](path, self.workers)
+        self.scanned.metadata.update((k, v) for k, v in scanned.items() if v)
+        return list(scanned)
+
     def log_licenses(
         self,
+        on_row: Optional[Callable[[List[str]], None]] = None,
     ) -> List[List[str]]:
         """Fetches license package metadata for the given dependency file.
 
+        Args:
+            on_row: Called with the row of each package found as soon as its
+                metadata resolves, before the other packages are fetched.
+                Exceptions raised by it cancel the pending fetches.
+
         Returns:
             List[List[str]]: Metadata from licenses found in dependency
             file.
         """
         self.licenselog_ = [[x.capitalize() for x in self.info_columns]]
 
-        for libname in self.parser(self.dependency_file, **self._parser_args):
-            pkg_metadata = self.get_license_metadata(libname)
-            libname_ = libname.split("/")[0]
-            lib_metadata = []
-            if not pkg_metadata:
-                lib_metadata.append(libname_)
-                lib_metadata.extend(
-                    ["Not found" for x in range(len(self.info_columns) - 1)]
-                )
-            else:
-                for col in self.info_columns:
-                    licenses = pkg_metadata.get(col, "")
-
-                    if not licenses:
-                        licenses = ""
-                    if col == "license":
-                        classifiers = pkg_metadata.get("classifiers", "")
-                        classifiers_licenses = [
-                            classifier.replace("License :: ", "").replace(
-                                "OSI Approved :: ", ""
-                            )
-                            for classifier in classifiers
-                            if classifier.startswith("License")
-                        ]
-                        licenses__ = "\n".join(classifiers_licenses).strip()
-                        licenses_exp = pkg_metadata.get("license_expression") or ""
-                        licenses_exp = "\n".join(licenses_exp.split(" AND "))
-                        
-                        if licenses_exp: 
-                            licenses = licenses_exp
-                        elif licenses.strip() == "":
-                            licenses = licenses__
-                        elif len(licenses) > len(licenses__) and len(licenses__) != 0:
-                            licenses = licenses__
-                    
-                    lib_metadata.append(licenses)
-
-            self.licenselog_.append(lib_metadata)
+        callback = partial(self._emit_row, on_row) if on_row is not None else None
+        packages = self.packages()
+        deadline = self._deadline()
+        if self.transitive:
+            packages, metadata, unresolved = self.resolve_closure(
+                packages, callback, deadline
+            )
+        else:
+            metadata, unresolved = self._fetch(packages, callback, deadline)
+        self._remember_unresolved(metadata, unresolved)
+        if self.deep_license:
+            self.add_wheel_licenses(metadata, deadline)
+        for libname in packages:
+            self.licenselog_.append(
+                self.format_row(libname, metadata[libname], libname in unresolved)
+            )
 
         return self.licenselog_
 
-    def get_license_metadata(self, libname: str) -> Any:
-        """Fetch information from package manager site.
+    def resolve_many(self, specs: Iterable[str]) -> Tuple[PackageLicense, ...]:
+        """Resolve the licenses of packages given in memory.
+
+        Unlike :meth:`log_licenses`, nothing is stored on the logger, so one
+        logger can serve concurrent calls from several threads, sharing its
+        metadata sources, cache and index concurrency limit between them.
 
         Args:
-            libname: Name of the package to fetch information regarding
+            specs: Packages as requirements, such as ``name==1.0``, or as
+                package keys (``name`` or ``name/version``)
 
         Returns:
-            Any: The metadata of the library
+            Tuple[PackageLicense, ...]: The license of each package, in order,
+            followed by their dependencies when resolving transitively
+        """
+        keys = [package_key(x) for x in specs]
+        deadline = self._deadline()
+        if self.transitive:
+            keys, metadata, unresolved = self.resolve_closure(keys, deadline=deadline)
+        else:
+            metadata, unresolved = self._fetch(keys, deadline=deadline)
+        if self.deep_license:
+            self.add_wheel_licenses(metadata, deadline)
+        return tuple(
+            self._package_license(x, metadata[x], x in unresolved) for x in keys
+        )
+
+    def _package_license(
+        self, libname: str, pkg_metadata: Any, unresolved: bool
+    ) -> PackageLicense:
+        name, _, version = libname.partition("/")
+        if not pkg_metadata:
+            return PackageLicense(libname, name, version, (), False, unresolved)
+        licenses = self.format_license(pkg_metadata).split("\n")
+        return PackageLicense(
+            libname,
+            pkg_metadata.get("name") or name,
+            pkg_metadata.get("version") or version,
+            tuple(x for x in licenses if x),
+            True,
+        )
+
+    def table(self, columns: Optional[List[str]] = None) -> List[List[str]]:
+        """Select columns of the license log, logging licenses only once.
+
+        Args:
+            columns: Info columns to include, all logged columns by default
+
+        Returns:
+            List[List[str]]: The license log restricted to the columns
+
+        Raises:
+            ValueError: If a column was not logged
+        """
+        license_log = self.licenselog_ if self.is_logged() else self.log_licenses()
+        if columns is None:
+            return license_log
+        missing = [x for x in columns if x not in self.info_columns]
+        if missing:
+            raise ValueError(f"Columns were not logged: {', '.join(missing)}")
+        indices = [self.info_columns.index(x) for x in columns]
+        return [[row[i] for i in indices] for row in license_log]
+
+    def _emit_row(
+        self, on_row: Callable[[List[str]], None], libname: str, pkg_metadata: Any
+    ) -> None:
+        on_row(self.format_row(libname, pkg_metadata))
+
+    def resolve_closure(
+        self,
+        libnames: List[str],
+        callback: Optional[AnswerCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[List[str], Dict[str, Any], Set[str]]:
+        """Expand packages with their dependencies, recursively.
+
+        The dependency graph is walked breadth-first, fetching every level
+        in one concurrent batch, so resolving takes about one round of
+        fetches per level of the graph. Each package is fetched once, with
+        the extras of all its requirers merged: a package expanded before
+        a later requirer asked for more extras is expanded again.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+            callback: Called with each package found as soon as it resolves
+            deadline: Monotonic time after which lookups are abandoned.
+                Defaults to the deadline of the logger from now.
+
+        Returns:
+            Tuple[List[str], Dict[str, Any], Set[str]]: The package keys of the
+            closure in breadth-first order, the metadata of each and the keys
+            abandoned at the deadline
+        """
+        if deadline is None:
+            deadline = self._deadline()
+        order = list(dict.fromkeys(libnames))
+        keys = {canonicalize_name(x.split("/")[0]): x for x in reversed(order)}
+        extras: Dict[str, Set[str]] = {}
+        expanded: Set[str] = set()
+        metadata: Dict[str, Any] = {}
+        unresolved: Set[str] = set()
+        level = list(order)
+        while level:
+            fetched, abandoned = self._fetch(
+                [x for x in level if x not in metadata], callback, deadline
+            )
+            metadata.update(fetched)
+            unresolved.update(abandoned)
+            next_level = []
+            for libname in level:
+                name = canonicalize_name(libname.split("/")[0])
+                expanded.add(name)
+                pkg_metadata = metadata[libname] or {}
+                for req in active_requirements(
+                    pkg_metadata.get("requires_dist"),
+                    self.environment,
+                    extras.get(name, ()),
+                ):
+                    dependency = canonicalize_name(req.name)
+                    known = extras.setdefault(dependency, set())
+                    grown = not known.issuperset(req.extras)
+                    known.update(req.extras)
+                    if dependency not in keys:
+                        keys[dependency] = req.name
+                        order.append(req.name)
+                        next_level.append(req.name)
+                    elif grown and dependency in expanded:
+                        next_level.append(keys[dependency])
+            level = list(dict.fromkeys(next_level))
+        return order, metadata, unresolved
+
+    def fetch_metadata(
+        self, libnames: List[str], callback: Optional[AnswerCallback] = None
+    ) -> Dict[str, Any]:
+        """Fetch metadata of several packages through the source chain.
+
+        Every source is asked, in one batch, only for the packages the
+        earlier sources could not answer. Answers are cached as they come
+        in, so they are kept even if the callback aborts the fetch, and kept
+        in memory until they expire like the cache, so fetching them again
+        costs no lookups. Packages no index has are cached as missing.
+
+        Packages abandoned at the deadline are remembered, to be logged as
+        unresolved.
+
+        Args:
+            libnames: Names of the packages to fetch information regarding
+            callback: Called with each package found as soon as it resolves
+
+        Returns:
+            Dict[str, Any]: The metadata of each library, ``None`` if missing
         """
-        lib_url = self.library_url.replace("XXX", libname)
+        metadata, unresolved = self._fetch(libnames, callback, self._deadline())
+        self._remember_unresolved(metadata, unresolved)
+        return metadata
+
+    def _deadline(self) -> Optional[float]:
+        # Each lookup gets the whole time, however long the logger has lived
+        return None if self.deadline is None else time.monotonic() + self.deadline
+
+    def _remember_unresolved(
+        self, metadata: Dict[str, Any], unresolved: Set[str]
+    ) -> None:
+        # Each package keeps the outcome of its latest lookup as a whole
+        with self._unresolved_lock:
+            self.unresolved.difference_update(metadata)
+            self.unresolved.update(unresolved)
+
+    def _fetch(
+        self,
+        libnames: List[str],
+        callback: Optional[AnswerCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Dict[str, Any], Set[str]]:
+        # Like fetch_metadata, returning the packages abandoned at the
+        # deadline instead of remembering them, for concurrent callers
+        metadata: Dict[str, Any] = {}
+        unresolved: Set[str] = set()
+        missing: Optional[Set[str]] = None
+        pending = list(dict.fromkeys(libnames))
+        try:
+            for source in self.sources:
+                if not pending:
+                    break
+                with span(
+                    "resolve", source=type(source).__name__, packages=len(pending)
+                ):
+                    lookup = source.fetch_many(
+                        pending, partial(self._answer, source, callback), deadline
+                    )
+                metadata.update(lookup.metadata)
+                unresolved.update(lookup.unresolved)
+                if source.cacheable:
+                    # A miss is only certain if no index failed to answer
+                    missing = set(
+                        lookup.missing if missing is None else missing & lookup.missing
+                    )
+                pending = [x for x in pending if x not in lookup.metadata]
+            for libname in pending:
+                if missing and libname in missing:
+                    self.cache.store(libname, None)
+        finally:
+            self.cache.save()
+
+        metadata.update(dict.fromkeys(pending))
+        return metadata, unresolved.intersection(pending)
+
+    def _answer(
+        self,
+        source: MetadataSource,
+        callback: Optional[AnswerCallback],
+        libname: str,
+        pkg_metadata: Any,
+    ) -> None:
+        if source.cacheable:
+            self.cache.store(libname, pkg_metadata)
+        if source is not self.resolved and pkg_metadata is not None:
+            self.resolved.cache.store(libname, pkg_metadata)
+        if callback is not None:
+            callback(libname, pkg_metadata)
+
+    def _revalidate(self, sources: List[IndexSource], libnames: List[str]) -> None:
+        """Refresh expired cache entries in the background.
+
+        Refreshes run on daemon threads, so a slow index does not hold up
+        the exit of the interpreter for longer than ``REFRESH_EXIT_TIMEOUT``.
+        Entries whose refresh is abandoned are refreshed on the next run.
+
+        Args:
+            sources: Indexes to fetch the packages from
+            libnames: Package keys of the expired entries
+        """
+        with self._refresh_lock:
+            libnames = [x for x in libnames if x not in self._refreshing]
+            if not libnames:
+                return
+            self._refreshing.update(libnames)
+            if not self._refreshes:
+                atexit.register(self.wait_for_refresh, REFRESH_EXIT_TIMEOUT)
+            thread = threading.Thread(
+                target=self._refresh,
+                args=(sources, libnames),
+                name="loglicense-refresh",
+                daemon=True,
+            )
+            self._refreshes.append(thread)
+        thread.start()
+
+    def _refresh(self, sources: List[IndexSource], libnames: List[str]) -> None:
+        pending = libnames
         try:
-            with urlopen(lib_url) as libfile:
-                output = json.loads(libfile.read().decode())
+            with span("refresh", packages=len(libnames)):
+                # Fetched one by one on this thread: the worker pool of an
+                # index would be waited for at exit, and its flags are those
+                # of the lookups in the foreground
+                for source in sources:
+                    answered = set()
+                    for libname in pending:
+                        pkg_metadata = source.get_license_metadata(libname)
+                        if pkg_metadata:
+                            self.cache.store(libname, pkg_metadata)
+                            answered.add(libname)
+                    pending = [x for x in pending if x not in answered]
+            self.cache.save()
+        except Exception as error:
+            logger.warning(f"Refreshing cached metadata failed: {error}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.difference_update(libnames)
+
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> None:
+        """Wait for the background refreshes of expired cache entries.
 
-                if self.package_manager == "pypi":
-                    output = output.get("info", {})
-            return output
+        Refreshes still running when the interpreter exits are waited for
+        up to ``REFRESH_EXIT_TIMEOUT`` seconds, then abandoned.
 
-        except Exception:
-            logger.warning(f"{libname}: error in fetching metadata")
-            return None
+        Args:
+            timeout: Most seconds to wait, ``None`` to wait until done
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._refresh_lock:
+            refreshes = list(self._refreshes)
+        for thread in refreshes:
+            thread.join(None if end is None else max(0.0, end - time.monotonic()))
+        with self._refresh_lock:
+            self._refreshes = [x for x in self._refreshes if x.is_alive()]
+
+    def add_wheel_licenses(
+        self, metadata: Dict[str, Any], deadline: Optional[float] = None
+    ) -> None:
+        """Fill in licenses from the license files of remote wheels.
+
+        Only packages whose metadata lacks a usable license are looked at.
+
+        Args:
+            metadata: The metadata of each library, updated in place
+            deadline: Monotonic time after which wheels are no longer read.
+                Defaults to the deadline of the logger from now.
+        """
+        if deadline is None:
+            deadline = self._deadline()
+        vague = [
+            libname
+            for libname, pkg_metadata in metadata.items()
+            if pkg_metadata
+            and pkg_metadata.get("wheel_url")
+            and needs_deep_license(pkg_metadata)
+        ]
+        remaining = time_left(deadline)
+        if not vague or remaining == 0.0:
+            return
+        executor = ThreadPoolExecutor(max_workers=max(1, self.workers))
+        futures = {
+            executor.submit(
+                wheel_license, metadata[x]["wheel_url"], deadline=deadline
+            ): x
+            for x in vague
+        }
+        with span("deep_license", packages=len(vague)):
+            done, _ = wait(futures, timeout=remaining)
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in done:
+            lib_license = future.result()
+            if lib_license:
+                libname = futures[future]
+                metadata[libname] = {**metadata[libname], "license": lib_license}
+                self.resolved.cache.store(libname, metadata[libname])
+
+    def format_row(
+        self, libname: str, pkg_metadata: Any, unresolved: Optional[bool] = None
+    ) -> List[str]:
+        """Format the metadata of a package into a row of the license log.
+
+        Args:
+            libname: Name of the package as given by the dependency file
+            pkg_metadata: The metadata of the library, if found
+            unresolved: Whether the lookup of the package was abandoned at the
+                deadline. Defaults to whether its latest lookup was.
+
+        Returns:
+            List[str]: The info columns of the package
+        """
+        libname_ = libname.split("/")[0]
+        lib_metadata = []
+        if not pkg_metadata:
+            if unresolved is None:
+                unresolved = libname in self.unresolved
+            missing = UNRESOLVED_LICENSE if unresolved else "Not found"
+            lib_metadata.append(libname_)
+            lib_metadata.extend([missing for x in range(len(self.info_columns) - 1)])
+            return lib_metadata
+
+        for col in self.info_columns:
+            if col == "license":
+                lib_metadata.append(self.format_license(pkg_metadata))
+            else:
+                lib_metadata.append(pkg_metadata.get(col) or "")
+
+        return lib_metadata
+
+    @staticmethod
+    def format_license(pkg_metadata: Dict[str, Any]) -> str:
+        """Pick the licenses of a package from its metadata.
+
+        The license expression is preferred, then the license field unless
+        the license classifiers are shorter, such as for full license texts.
+
+        Args:
+            pkg_metadata: The metadata of the library
+
+        Returns:
+            str: The licenses of the package, separated by newlines
+        """
+        licenses = pkg_metadata.get("license") or ""
+        classifiers = pkg_metadata.get("classifiers", "")
+        classifiers_licenses = [
+            classifier.replace("License :: ", "").replace("OSI Approved :: ", "")
+            for classifier in classifiers
+            if classifier.startswith("License")
+        ]
+        licenses__ = "\n".join(classifiers_licenses).strip()
+        licenses_exp = pkg_metadata.get("license_expression") or ""
+        licenses_exp = "\n".join(licenses_exp.split(" AND "))
+
+        if licenses_exp:
+            return str(licenses_exp)
+        if licenses.strip() == "":
+            return licenses__
+        if len(licenses) > len(licenses__) and len(licenses__) != 0:
+            return licenses__
+        return str(licenses)
+
+    def get_license_metadata(self, libname: str) -> Any:
+        """Fetch information regarding a single package.
+
+        Args:
+            libname: Name of the package to fetch information regarding
+
+        Returns:
+            Any: The metadata of the library
+        """
+        return self.fetch_metadata([libname])[libname]
 
     def is_logged(self) -> bool:
         """Check if logged.
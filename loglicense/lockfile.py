@@ -0,0 +1,112 @@
+"""License lock files, recording the licenses and verdicts of packages."""
+import json
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+
+#: Name of the lock file, written next to the dependency file
+LOCK_FILE = "loglicense.lock"
+LOCK_FORMAT = "loglicense-lock"
+LOCK_VERSION = 1
+# Metadata fields the license of a package is formatted from
+LICENSE_FIELDS = ("name", "version", "license", "license_expression", "classifiers")
+
+
+class LicenseLock(NamedTuple):
+    """Contents of a license lock file.
+
+    Args:
+        policy: Digest of the policy the verdicts were given under
+        packages: License fields and verdicts by package key
+
+    """
+
+    policy: str
+    packages: Dict[str, Dict[str, Any]]
+
+    def metadata(self) -> Dict[str, Dict[str, Any]]:
+        """Metadata of the locked packages, to be answered without lookups.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The license fields by package key
+        """
+        return {
+            key: {k: v for k, v in entry.items() if k in LICENSE_FIELDS}
+            for key, entry in self.packages.items()
+        }
+
+
+def lock_path(dependency_file: Path) -> Path:
+    """Locate the lock file of a dependency file.
+
+    Args:
+        dependency_file: Path to the dependency file
+
+    Returns:
+        Path: The lock file next to the dependency file
+    """
+    return dependency_file.parent / LOCK_FILE
+
+
+def lock_entry(
+    pkg_metadata: Dict[str, Any], results: List[List[str]]
+) -> Dict[str, Any]:
+    """Record the license fields and verdicts of a package.
+
+    Only license classifiers are kept, so the lock stays short to review.
+
+    Args:
+        pkg_metadata: The metadata of the package
+        results: Validated rows of the package, with the license in the
+            second to last and its status in the last column
+
+    Returns:
+        Dict[str, Any]: The entry of the package in the lock
+    """
+    entry = {k: pkg_metadata[k] for k in LICENSE_FIELDS if pkg_metadata.get(k)}
+    if "classifiers" in entry:
+        entry["classifiers"] = [
+            x for x in entry["classifiers"] if x.startswith("License")
+        ]
+    entry["verdict"] = {row[-2]: row[-1] for row in results}
+    return entry
+
+
+def read_lock(path: Path) -> Optional[LicenseLock]:
+    """Read a lock file.
+
+    Args:
+        path: Path to the lock file
+
+    Returns:
+        Optional[LicenseLock]: The lock, ``None`` if there is no lock file
+
+    Raises:
+        ValueError: If the file is not a license lock of a known version
+    """
+    if not path.is_file():
+        return None
+    raw = json.loads(path.read_text())
+    if raw.get("format") != LOCK_FORMAT or raw.get("version") != LOCK_VERSION:
+        raise ValueError(f"{path}: not a version {LOCK_VERSION} license lock")
+    return LicenseLock(raw["policy"], raw["packages"])
+
+
+def write_lock(path: Path, lock: LicenseLock) -> None:
+    """Write a lock file, sorted and indented for reviewable diffs.
+
+    Args:
+        path: Path to the lock file
+        lock: The lock to write
+    """
+    payload = {
+        "format": LOCK_FORMAT,
+        "version": LOCK_VERSION,
+        "policy": lock.policy,
+        "packages": lock.packages,
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,262 @@
+"""License policies and the verdicts of checking packages against them."""
+import configparser
+import dataclasses
+import hashlib
+import json
+from dataclasses import dataclass
+from dataclasses import field
+from difflib import get_close_matches
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+
+from loglicense.trace import span
+
+
+ACCEPTED_STATUSES = ("Allowed", "Manually validated")
+#: License of packages whose lookup was abandoned at the deadline
+UNRESOLVED_LICENSE = "Unresolved (timeout)"
+#: How unresolved packages count towards the license coverage
+UNRESOLVED_POLICIES = ("unknown", "ignore", "allow")
+
+
+class BannedLicenseError(Exception):
+    """A package has a banned license.
+
+    Args:
+        package: Name of the package
+        lib_license: The banned license
+
+    """
+
+    def __init__(self, package: str, lib_license: str):
+        super().__init__(package, lib_license)
+        self.package = package
+        self.lib_license = lib_license
+
+    def __str__(self) -> str:
+        """Describe the banned license.
+
+        Returns:
+            str: Package and its banned license
+        """
+        return f"{self.package}: banned license {self.lib_license}"
+
+
+def _config_values(config: configparser.SectionProxy, key: str) -> FrozenSet[str]:
+    return frozenset(
+        x.lower().strip() for x in config.get(key, "").split(",") if x.strip()
+    )
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """Verdict of checking a license log against a policy.
+
+    Args:
+        results: Validated rows, including the header row, with the status of
+            each license in the last column
+        target: Required license coverage in percent, if any
+        unresolved: How unresolved packages count towards the coverage:
+            ``unknown`` like unknown licenses, ``ignore`` not at all or
+            ``allow`` like allowed licenses
+
+    """
+
+    results: List[List[str]]
+    target: Optional[int] = None
+    unresolved: str = "unknown"
+    coverage: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Compute the license coverage of the results."""
+        statuses = self.statuses
+        accepted_statuses = list(ACCEPTED_STATUSES)
+        if self.unresolved == "ignore":
+            statuses = [x for x in statuses if x != "Unresolved"]
+        elif self.unresolved == "allow":
+            accepted_statuses.append("Unresolved")
+        accepted = sum(statuses.count(x) for x in accepted_statuses)
+        coverage = int((accepted / len(statuses)) * 100) if statuses else 100
+        object.__setattr__(self, "coverage", coverage)
+
+    @property
+    def statuses(self) -> List[str]:
+        """Status of every validated row.
+
+        Returns:
+            List[str]: The statuses in row order
+        """
+        return [x[-1] for x in self.results[1:]]
+
+    @property
+    def banned(self) -> bool:
+        """Whether any license is banned.
+
+        Returns:
+            bool: Whether any license is banned
+        """
+        return "Banned" in self.statuses
+
+    @property
+    def exit_code(self) -> int:
+        """Exit code of the check command for this verdict.
+
+        Returns:
+            int: 1 if any license is banned, 2 if the coverage is below the
+            target and 0 otherwise
+        """
+        if self.banned:
+            return 1
+        if self.target is not None and self.coverage < self.target:
+            return 2
+        return 0
+
+    def summary(self) -> str:
+        """Describe the license coverage.
+
+        Returns:
+            str: Target and actual license coverage
+        """
+        unresolved = self.statuses.count("Unresolved")
+        note = f" ({unresolved} unresolved)" if unresolved else ""
+        if self.target is None:
+            return f"License coverage: {self.coverage}%{note}"
+        return (
+            f"Target license coverage ({self.target}%) "
+            f"and actual coverage: {self.coverage}%{note}"
+        )
+
+
+@dataclass(frozen=True)
+class LicensePolicy:
+    """Allowed, banned and manually validated licenses of a project.
+
+    Args:
+        allowed: Lowercased licenses allowed in the project
+        banned: Lowercased licenses banned from the project
+        validated: Lowercased names of manually validated packages
+        coverage: Required license coverage in percent, if any
+        unresolved: How packages unresolved at the deadline count towards
+            the coverage, one of ``unknown``, ``ignore`` or ``allow``
+
+    """
+
+    allowed: FrozenSet[str] = frozenset()
+    banned: FrozenSet[str] = frozenset()
+    validated: FrozenSet[str] = frozenset()
+    coverage: Optional[int] = None
+    unresolved: str = "unknown"
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "LicensePolicy":
+        """Read the policy from the loglicense section of a config file.
+
+        Args:
+            config_file: Path to the config file
+
+        Returns:
+            LicensePolicy: The configured policy
+
+        Raises:
+            ValueError: If the unresolved policy is not recognised
+        """
+        cf = configparser.ConfigParser()
+        cf.read(config_file)
+        config = cf["loglicense"]
+        unresolved = config.get("unresolved", "unknown").strip().lower()
+        if unresolved not in UNRESOLVED_POLICIES:
+            raise ValueError(
+                f"Unknown unresolved policy {unresolved!r}, "
+                f"expected one of {', '.join(UNRESOLVED_POLICIES)}"
+            )
+        return cls(
+            allowed=_config_values(config, "allowed"),
+            banned=_config_values(config, "banned"),
+            validated=_config_values(config, "validated"),
+            coverage=int(config["coverage"]) if "coverage" in config else None,
+            unresolved=unresolved,
+        )
+
+    def digest(self) -> str:
+        """Fingerprint the policy, telling whether verdicts given under it hold.
+
+        Returns:
+            str: Hex digest of the policy
+        """
+        settings = json.dumps(dataclasses.asdict(self), sort_keys=True, default=sorted)
+        return hashlib.sha256(settings.encode()).hexdigest()
+
+    def status(self, name: str, lib_license: str) -> str:
+        """Validate a single license of a package.
+
+        Args:
+            name: Name of the package
+            lib_license: One of the licenses of the package
+
+        Returns:
+            str: Status of the license
+        """
+        if name in self.validated:
+            return "Manually validated"
+        if lib_license == UNRESOLVED_LICENSE:
+            return "Unresolved"
+        normalised = lib_license.lower().replace("license", "")
+        if self.banned and get_close_matches(normalised, self.banned):
+            return "Banned"
+        if self.allowed and not get_close_matches(normalised, self.allowed):
+            return "Unknown"
+        return "Allowed"
+
+    def validate(self, license_log: List[List[str]]) -> List[List[str]]:
+        """Compare licenses to the policy.
+
+        Packages with multiple licenses get one row per license.
+
+        Args:
+            license_log: Rows of a license log, including the header row, with
+                the name in the first and the license in the last column
+
+        Returns:
+            List[List[str]]: Returns results of validation of license
+        """
+        header = license_log[0]
+        results = [header + ["Status"]]
+        for lib in license_log[1:]:
+            # handle multiple licenses
+            for lib_license in lib[-1].split("\n"):
+                row_info = [
+                    lib_license if key.lower() == "license" else val
+                    for val, key in zip(lib, header)
+                ]
+                results.append(row_info + [self.status(lib[0], lib_license)])
+        return results
+
+    def ensure_not_banned(self, header: List[str], row: List[str]) -> None:
+        """Validate a single row of a license log.
+
+        Args:
+            header: Header row of the license log
+            row: Row of a package, with the name in the first and the license
+                in the last column
+
+        Raises:
+            BannedLicenseError: If any license of the package is banned
+        """
+        for result in self.validate([header, row])[1:]:
+            if result[-1] == "Banned":
+                raise BannedLicenseError(row[0], result[-2])
+
+    def check(self, license_log: List[List[str]]) -> CheckResult:
+        """Validate a license log and judge the outcome.
+
+        Args:
+            license_log: Rows of a license log, including the header row
+
+        Returns:
+            CheckResult: The verdict of the check
+        """
+        with span("validate", packages=len(license_log) - 1):
+            return CheckResult(
+                self.validate(license_log), self.coverage, self.unresolved
+            )
@@ -0,0 +1,195 @@
+"""Reading dependency files from git revisions."""
+import os
+import subprocess  # noqa: S404
+from functools import partial
+from pathlib import Path
+from types import TracebackType
+from typing import IO
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+
+from loglicense.utils import RequirementsCollector
+
+
+#: Reads a file at a revision, giving its object id and content, or ``None``
+BlobRead = Callable[[str], Optional[Tuple[str, bytes]]]
+
+
+def _object_name(revision: str, path: str) -> str:
+    return f"{revision}:./{Path(os.path.relpath(path)).as_posix()}"
+
+
+def checkout_file(
+    read: BlobRead, path: str, workdir: Path
+) -> Optional[Tuple[Path, Tuple[str, ...]]]:
+    """Write a file as it is at a revision to a directory.
+
+    Requirements files are written along with the files they include with
+    ``-r`` or ``-c`` and their ``_dev.txt`` counterpart, all as they are at
+    the same revision. Files keep their absolute path below the directory,
+    so includes relative to a file resolve as in the working tree.
+
+    Args:
+        read: Reads a file at the revision, see :class:`BlobReader`
+        path: Path to the file, relative to the working directory
+        workdir: Directory to write the files to
+
+    Returns:
+        Optional[Tuple[Path, Tuple[str, ...]]]: The copy of the file and the
+        object ids of all files written, ``None`` if the file does not exist
+        at the revision
+
+    Raises:
+        ValueError: If an included file does not exist at the revision
+    """
+    written: Dict[Path, str] = {}
+    source = Path(path).absolute()
+    if not _checkout(read, source, workdir, written):
+        return None
+    dev_file = source.with_name(source.stem + "_dev.txt")
+    if source.name.endswith(".txt") and read(str(dev_file)) is not None:
+        _checkout(read, dev_file, workdir, written)
+    return workdir / source.relative_to(source.anchor), tuple(written.values())
+
+
+def _checkout(
+    read: BlobRead, source: Path, workdir: Path, written: Dict[Path, str]
+) -> bool:
+    source = Path(os.path.normpath(source))
+    if source in written:
+        return True
+    blob = read(str(source))
+    if blob is None:
+        return False
+    written[source] = blob[0]
+    target = workdir / source.relative_to(source.anchor)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(blob[1])
+    if source.name.endswith(".txt"):
+        for include in RequirementsCollector.includes(blob[1].decode()):
+            if not _checkout(read, source.parent / include, workdir, written):
+                raise ValueError(f"{source}: included {include} does not exist")
+    return True
+
+
+def dependency_file_at(spec: str, dependency_file: str, workdir: Path) -> str:
+    """Locate a dependency file given as a path or a git revision.
+
+    Args:
+        spec: Path to a dependency file, a git revision of ``dependency_file``
+            or ``revision:path``
+        dependency_file: Dependency file of a bare revision
+        workdir: Directory to write files read from git revisions to
+
+    Returns:
+        str: Path to the dependency file
+
+    Raises:
+        ValueError: If the file does not exist at the revision
+    """
+    if Path(spec).is_file():
+        return spec
+    revision, sep, path = spec.partition(":")
+    path = path if sep else dependency_file
+    with BlobReader() as reader:
+        checkout = checkout_file(partial(reader.read, revision), path, workdir)
+    if checkout is None:
+        raise ValueError(f"Cannot read {path} at {revision}")
+    return str(checkout[0])
+
+
+def file_revisions(path: str) -> List[Tuple[str, str]]:
+    """List the commits that changed a file, oldest first.
+
+    Args:
+        path: Path to the file, relative to the working directory
+
+    Returns:
+        List[Tuple[str, str]]: Hash and date of each commit
+
+    Raises:
+        ValueError: If the git history cannot be read
+    """
+    process = subprocess.run(  # noqa: S603,S607
+        ["git", "log", "--reverse", "--format=%H %ad", "--date=short", "--", path],
+        capture_output=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        raise ValueError(f"Cannot read history of {path}: {process.stderr.decode()}")
+    revisions = [line.split(" ", 1) for line in process.stdout.decode().splitlines()]
+    return [(commit, date) for commit, date in revisions]
+
+
+class BlobReader:
+    """Reads files at many revisions through one ``git cat-file --batch``.
+
+    Objects are requested and read one at a time over the pipes of a single
+    long-running git process, instead of spawning git for every revision.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._process = subprocess.Popen(  # noqa: S603,S607
+            ["git", "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        if self._process.stdin is None or self._process.stdout is None:
+            raise OSError("Cannot communicate with git cat-file")
+        self._stdin: IO[bytes] = self._process.stdin
+        self._stdout: IO[bytes] = self._process.stdout
+
+    def __enter__(self) -> "BlobReader":
+        """Use the reader as a context manager.
+
+        Returns:
+            BlobReader: The reader itself
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Stop the git process.
+
+        Args:
+            exc_type: Type of the exception raised in the block, if any
+            exc_value: Exception raised in the block, if any
+            traceback: Traceback of the exception, if any
+        """
+        self.close()
+
+    def read(self, revision: str, path: str) -> Optional[Tuple[str, bytes]]:
+        """Read a file as it is at a revision.
+
+        Args:
+            revision: Git revision, such as a commit hash
+            path: Path to the file, relative to the working directory
+
+        Returns:
+            Optional[Tuple[str, bytes]]: Object id and content of the file,
+            ``None`` if the file does not exist at the revision
+        """
+        self._stdin.write(f"{_object_name(revision, path)}\n".encode())
+        self._stdin.flush()
+        header = self._stdout.readline().decode().split()
+        if len(header) != 3:
+            return None
+        oid, _, size = header
+        content = self._stdout.read(int(size))
+        self._stdout.read(1)
+        return oid, content
+
+    def close(self) -> None:
+        """Stop the git process."""
+        self._stdin.close()
+        self._process.wait()
+        self._stdout.close()
@@ -0,0 +1,140 @@
+"""Reading packages and their licenses from SBOMs and pip inspect reports."""
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from loglicense.jsonstream import JsonMemberReader
+
+
+#: Members listing the packages of CycloneDX and SPDX SBOMs, and pip inspect
+PACKAGE_LISTS = ("components", "packages", "installed")
+# SPDX values that state no license is known
+_SPDX_UNKNOWN = ("NOASSERTION", "NONE")
+
+
+def _is_pypi(purls: List[str]) -> bool:
+    # Packages without a package URL, such as the application or files the
+    # SBOM describes, cannot be told to be Python packages and are skipped
+    return any(x.startswith("pkg:pypi/") for x in purls)
+
+
+def _has_license(info: Dict[str, Any]) -> bool:
+    classifiers = info.get("classifiers") or []
+    return bool(
+        info.get("license_expression")
+        or info.get("license")
+        or any(x.startswith("License") for x in classifiers)
+    )
+
+
+def _cyclonedx_packages(component: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    # Components can nest the components they bundle
+    if _is_pypi([component["purl"]] if component.get("purl") else []):
+        expressions: List[str] = []
+        names: List[str] = []
+        for entry in component.get("licenses") or []:
+            if entry.get("expression"):
+                expressions.append(entry["expression"])
+            license_ = entry.get("license") or {}
+            name = license_.get("id") or license_.get("name")
+            if name:
+                names.append(str(name))
+        yield {
+            "name": component.get("name"),
+            "version": component.get("version"),
+            "license": "",
+            "license_expression": " AND ".join(expressions or names) or None,
+        }
+    for nested in component.get("components") or []:
+        yield from _cyclonedx_packages(nested)
+
+
+def _spdx_package(package: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    purls = [
+        x.get("referenceLocator", "")
+        for x in package.get("externalRefs") or []
+        if x.get("referenceType") == "purl"
+    ]
+    if not _is_pypi(purls):
+        return None
+    licenses = [
+        package.get(x)
+        for x in ("licenseConcluded", "licenseDeclared")
+        if package.get(x) and package.get(x) not in _SPDX_UNKNOWN
+    ]
+    return {
+        "name": package.get("name"),
+        "version": package.get("versionInfo"),
+        "license": "",
+        "license_expression": licenses[0] if licenses else None,
+    }
+
+
+def _pip_inspect_package(installed: Dict[str, Any]) -> Dict[str, Any]:
+    # pip inspect reports core metadata as JSON, with one key per field
+    metadata = installed.get("metadata") or {}
+    return {
+        "name": metadata.get("name"),
+        "version": metadata.get("version"),
+        "summary": metadata.get("summary"),
+        "home_page": metadata.get("home_page"),
+        "author": metadata.get("author"),
+        "license": metadata.get("license") or "",
+        "license_expression": metadata.get("license_expression"),
+        "classifiers": metadata.get("classifier") or [],
+        "requires_dist": metadata.get("requires_dist"),
+    }
+
+
+def iter_sbom_packages(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream the packages of an SBOM or a pip inspect report.
+
+    CycloneDX and SPDX SBOMs in JSON and ``pip inspect`` reports are
+    recognised by the member listing their packages. Packages are decoded
+    one at a time, so memory use does not grow with the size of the file.
+    Packages with a package URL of another ecosystem are left out.
+
+    Args:
+        path: Path to the JSON file
+
+    Yields:
+        Dict[str, Any]: The metadata of each package, as a PyPI-like info dict
+    """
+    with path.open("rb") as sbom:
+        for member, item in JsonMemberReader(sbom).iter_items(PACKAGE_LISTS):
+            if not isinstance(item, dict):
+                continue
+            if member == "components":
+                yield from _cyclonedx_packages(item)
+            elif member == "packages":
+                info = _spdx_package(item)
+                if info is not None:
+                    yield info
+            else:
+                yield _pip_inspect_package(item)
+
+
+def read_sbom(path: Path, workers: int = 1) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Read the packages of an SBOM or a pip inspect report.
+
+    Args:
+        path: Path to the JSON file
+        workers: Unused, as the file is read in one pass
+
+    Returns:
+        Dict[str, Optional[Dict[str, Any]]]: Metadata by package key, ``None``
+        for packages without license information, which are to be looked up
+    """
+    output: Dict[str, Optional[Dict[str, Any]]] = {}
+    for info in iter_sbom_packages(path):
+        if not info.get("name"):
+            continue
+        key = (
+            f"{info['name']}/{info['version']}" if info.get("version") else info["name"]
+        )
+        if output.get(key) is None:
+            output[key] = info if _has_license(info) else None
+    return output
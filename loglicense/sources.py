@@ -0,0 +1,567 @@
+"""Sources of package metadata, queried in order as a chain."""
+import fnmatch
+import logging
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
+from importlib import metadata as importlib_metadata
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from packaging.utils import canonicalize_name
+
+from loglicense.cache import FetchTimings
+from loglicense.cache import MetadataCache
+from loglicense.jsonstream import JsonMemberReader
+from loglicense.throttle import THROTTLED_STATUSES
+from loglicense.throttle import AdaptiveLimit
+from loglicense.throttle import parse_retry_after
+from loglicense.trace import span
+
+
+logger = logging.getLogger("licenselogger")
+
+PYPI_URL = "https://pypi.python.org/pypi"
+DEFAULT_SOURCES = ["cache", "pypi"]
+#: Highest number of concurrent fetches the adaptive limit grows to
+MAX_WORKERS = 32
+#: Largest index response read, in bytes
+MAX_RESPONSE_SIZE = 64 * 2**20
+#: Seconds an index request may block without a deadline, so abandoned
+#: fetches never keep the interpreter from exiting
+FETCH_TIMEOUT = 30.0
+#: License of private packages without a preset license
+PRIVATE_LICENSE = "Private"
+#: Metadata field marking metadata whose wheel URLs were read from the index
+URLS_READ = "urls_read"
+
+#: Called with the key and metadata of each package as soon as it is answered
+AnswerCallback = Callable[[str, Any], None]
+
+
+class Lookup(NamedTuple):
+    """Outcome of looking up several packages in a source.
+
+    Args:
+        metadata: Metadata of the packages the source could answer
+        unresolved: Package keys whose lookup was abandoned at the deadline
+        missing: Package keys the source confirmed it does not have
+
+    """
+
+    metadata: Dict[str, Any]
+    unresolved: FrozenSet[str] = frozenset()
+    missing: FrozenSet[str] = frozenset()
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Time left until a deadline.
+
+    Args:
+        deadline: Monotonic time of the deadline, if any
+
+    Returns:
+        Optional[float]: Seconds left, ``None`` without a deadline
+    """
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def metadata_to_info(message: Any) -> Dict[str, Any]:
+    """Convert core metadata (METADATA/PKG-INFO) into a PyPI-like info dict.
+
+    Args:
+        message: Parsed core metadata, as an ``email.message.Message``
+
+    Returns:
+        Dict[str, Any]: The fields of the PyPI JSON API ``info`` object
+    """
+    return {
+        "name": message.get("Name"),
+        "version": message.get("Version"),
+        "summary": message.get("Summary"),
+        "home_page": message.get("Home-page"),
+        "author": message.get("Author"),
+        "license": message.get("License") or "",
+        "license_expression": message.get("License-Expression"),
+        "classifiers": message.get_all("Classifier") or [],
+        "requires_dist": message.get_all("Requires-Dist"),
+    }
+
+
+class MetadataSource:
+    """Base class of metadata sources.
+
+    A source answers the packages it knows about and leaves the rest for the
+    next source of the chain.
+    """
+
+    #: Whether the source needs network access
+    remote = False
+    #: Whether answers of the source should be stored in the metadata cache
+    cacheable = False
+
+    def fetch_many(
+        self,
+        libnames: List[str],
+        callback: Optional[AnswerCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Lookup:
+        """Look up the metadata of several packages.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+            callback: Called with each answered package as soon as it is
+                answered. Exceptions raised by it abort the lookup.
+            deadline: Monotonic time after which lookups are abandoned, if any
+
+        Returns:
+            Lookup: The packages the source could answer
+        """
+        answered = self.lookup_many(libnames)
+        if callback is not None:
+            for libname, pkg_metadata in answered.items():
+                callback(libname, pkg_metadata)
+        return Lookup(answered)
+
+    def lookup_many(self, libnames: List[str]) -> Dict[str, Any]:
+        """Look up the metadata of several packages in one go.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+
+        Returns:
+            Dict[str, Any]: Metadata of the packages the source could answer
+
+        Raises:
+            NotImplementedError: Implemented by subclasses
+        """
+        raise NotImplementedError
+
+
+class StaticSource(MetadataSource):
+    """Metadata known up front, such as read from distribution archives.
+
+    Args:
+        metadata: Metadata by package key
+
+    """
+
+    def __init__(self, metadata: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.metadata = metadata if metadata is not None else {}
+
+    def lookup_many(self, libnames: List[str]) -> Dict[str, Any]:
+        """Look up the known metadata.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+
+        Returns:
+            Dict[str, Any]: Known metadata of the packages
+        """
+        return {x: self.metadata[x] for x in libnames if x in self.metadata}
+
+
+class PrivateSource(MetadataSource):
+    """Packages that are never looked up, such as internal packages.
+
+    Package names are matched against glob patterns, like ``acme-*``, after
+    normalising both.
+
+    Args:
+        rules: Preset license by name pattern. Packages matching a pattern
+            without a preset license get the license ``Private``.
+
+    """
+
+    def __init__(self, rules: Dict[str, str]):
+        super().__init__()
+        self.rules = {canonicalize_name(k): v for k, v in rules.items()}
+
+    def lookup_many(self, libnames: List[str]) -> Dict[str, Any]:
+        """Answer the packages matching a private pattern.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+
+        Returns:
+            Dict[str, Any]: Metadata of the private packages
+        """
+        output = {}
+        for libname in libnames:
+            name, _, version = libname.partition("/")
+            for pattern, lib_license in self.rules.items():
+                if fnmatch.fnmatchcase(canonicalize_name(name), pattern):
+                    output[libname] = {
+                        "name": name,
+                        "version": version,
+                        "license": lib_license or PRIVATE_LICENSE,
+                    }
+                    break
+        return output
+
+
+class InstalledSource(MetadataSource):
+    """Metadata of the distributions installed in the running environment.
+
+    Pinned packages are only answered if the installed version matches.
+
+    Args:
+        path: Search path for distributions. Defaults to ``sys.path``.
+
+    """
+
+    def __init__(self, path: Optional[List[str]] = None):
+        super().__init__()
+        self.path = path
+        self._installed: Optional[Dict[str, Any]] = None
+
+    def lookup_many(self, libnames: List[str]) -> Dict[str, Any]:
+        """Look up installed distributions.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+
+        Returns:
+            Dict[str, Any]: Metadata of the installed packages
+        """
+        if self._installed is None:
+            distributions = (
+                importlib_metadata.distributions(path=self.path)
+                if self.path is not None
+                else importlib_metadata.distributions()
+            )
+            self._installed = {}
+            for dist in distributions:
+                name = dist.metadata["Name"]
+                if name:
+                    self._installed.setdefault(canonicalize_name(name), dist)
+
+        output = {}
+        for libname in libnames:
+            name, _, version = libname.partition("/")
+            installed = self._installed.get(canonicalize_name(name))
+            if installed is not None and version in ("", installed.version):
+                output[libname] = metadata_to_info(installed.metadata)
+        return output
+
+
+class CacheSource(MetadataSource):
+    """Metadata from the local metadata cache.
+
+    Packages cached as not found are answered with ``None`` metadata, so
+    later sources do not look them up again. With ``revalidate`` set, entries
+    past their TTL but within their hard expiry are answered as well, and
+    handed to ``revalidate`` to be refreshed for later runs.
+
+    Args:
+        cache: The metadata cache
+        stale: Whether to also answer with entries past their TTL
+        revalidate: Called with the keys of the expired entries answered
+        wheel_urls: Whether to only answer with entries whose ``urls`` were
+            read, see :class:`IndexSource`. Others are looked up again.
+
+    """
+
+    def __init__(
+        self,
+        cache: MetadataCache,
+        stale: bool = False,
+        revalidate: Optional[Callable[[List[str]], None]] = None,
+        wheel_urls: bool = False,
+    ):
+        super().__init__()
+        self.cache = cache
+        self.stale = stale
+        self.revalidate = revalidate
+        self.wheel_urls = wheel_urls
+
+    def lookup_many(self, libnames: List[str]) -> Dict[str, Any]:
+        """Look up cached metadata.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+
+        Returns:
+            Dict[str, Any]: Cached metadata of the packages
+        """
+        output = {}
+        expired = []
+        for libname in libnames:
+            entry = self.cache.lookup(libname)
+            if entry is None:
+                continue
+            if self.wheel_urls and entry.metadata and not entry.metadata.get(URLS_READ):
+                continue
+            if self.stale or self.cache.is_fresh(libname, entry):
+                output[libname] = entry.metadata
+            elif self.revalidate and self.cache.is_revalidatable(libname, entry):
+                output[libname] = entry.metadata
+                expired.append(libname)
+        if expired and self.revalidate is not None:
+            self.revalidate(expired)
+        return output
+
+
+class IndexSource(MetadataSource):
+    """Metadata from a package index serving the PyPI JSON API.
+
+    Works with PyPI itself as well as mirrors such as devpi or bandersnatch.
+    Packages are fetched concurrently, longest-processing-time-first based on
+    the latency and response size observed in earlier runs. The number of
+    concurrent fetches adapts to the latency of the index and backs off when
+    it throttles, honouring ``Retry-After``. Concurrent calls share one pool
+    of worker threads and the concurrency limit.
+
+    Responses are decoded while they stream in, up to the ``info`` object,
+    skipping the large ``releases`` of packages without reading further.
+    The URL of a wheel of the package, if any, is kept as ``wheel_url``. It
+    comes from the ``urls`` of the response, which are read for pinned
+    packages, whose responses have no ``releases``, and for other packages
+    only when ``wheel_urls`` is set. Metadata whose ``urls`` were read is
+    marked with ``urls_read``, so cached metadata lacking them is told apart.
+
+    Args:
+        url: Base URL of the JSON API, metadata is fetched from
+            ``{url}/{name}/json`` or ``{url}/{name}/{version}/json``
+        workers: Initial number of packages to fetch concurrently
+        timings: History of fetch timings to schedule by and record into
+        retries: Number of times a throttled request is retried
+        wheel_urls: Whether to read the wheel URL of packages that are not
+            pinned, which requires reading their whole response
+        max_response_size: Most bytes read from a response, ``None`` for no
+            limit. Larger responses are treated as failed lookups.
+
+    """
+
+    remote = True
+    cacheable = True
+
+    def __init__(
+        self,
+        url: str = PYPI_URL,
+        workers: int = 8,
+        timings: Optional[FetchTimings] = None,
+        retries: int = 3,
+        wheel_urls: bool = False,
+        max_response_size: Optional[int] = MAX_RESPONSE_SIZE,
+    ):
+        super().__init__()
+        self.library_url = url.rstrip("/") + "/XXX/json"
+        self.workers = workers
+        self.timings = timings if timings is not None else FetchTimings()
+        self.retries = retries
+        self.wheel_urls = wheel_urls
+        self.max_response_size = max_response_size
+        self.limit = AdaptiveLimit(
+            workers, maximum=max(workers, MAX_WORKERS) if workers > 1 else 1
+        )
+
+    def fetch_many(
+        self,
+        libnames: List[str],
+        callback: Optional[AnswerCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Lookup:
+        """Fetch metadata from the index.
+
+        Args:
+            libnames: Package keys (``name`` or ``name/version``)
+            callback: Called with each package found as soon as it is
+                fetched. Exceptions raised by it cancel the pending fetches.
+            deadline: Monotonic time after which lookups are abandoned, if any
+
+        Returns:
+            Lookup: The packages found on the index, and those abandoned at
+            the deadline or that the index does not have
+        """
+        metadata: Dict[str, Any] = {}
+        try:
+            if self.workers <= 1 or len(libnames) <= 1:
+                for libname in libnames:
+                    if time_left(deadline) == 0.0:
+                        break
+                    metadata[libname] = self.get_license_metadata(libname, deadline)
+                    if callback is not None and metadata[libname]:
+                        callback(libname, metadata[libname])
+            else:
+                self._fetch_concurrently(libnames, metadata, callback, deadline)
+        finally:
+            self.timings.save()
+
+        # Lookups failing once the deadline passed most likely timed out
+        expired = time_left(deadline) == 0.0
+        abandoned = frozenset(
+            x for x in libnames if x not in metadata or (expired and not metadata[x])
+        )
+        if abandoned:
+            logger.warning(f"Deadline reached, {len(abandoned)} lookups abandoned")
+        missing = frozenset(
+            x
+            for x, value in metadata.items()
+            if value is not None and not value and x not in abandoned
+        )
+        return Lookup(
+            {x: value for x, value in metadata.items() if value}, abandoned, missing
+        )
+
+    def _fetch_concurrently(
+        self,
+        libnames: List[str],
+        metadata: Dict[str, Any],
+        callback: Optional[AnswerCallback],
+        deadline: Optional[float],
+    ) -> None:
+        futures: Dict[Future[Any], str] = {}
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.limit.maximum, len(libnames)),
+            thread_name_prefix="loglicense",
+        )
+        try:
+            for libname in self.timings.schedule(libnames):
+                future = executor.submit(self.get_license_metadata, libname, deadline)
+                futures[future] = libname
+            for future in as_completed(futures, timeout=time_left(deadline)):
+                libname = futures[future]
+                metadata[libname] = future.result()
+                if callback is not None and metadata[libname]:
+                    callback(libname, metadata[libname])
+        except FuturesTimeoutError:
+            pass
+        finally:
+            # Fetches still queued are cancelled on the deadline or if the
+            # callback aborted, fetches in flight are not waited for and time
+            # out at the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reads_urls(self, libname: str) -> bool:
+        return self.wheel_urls or "/" in libname
+
+    def get_license_metadata(
+        self, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        """Fetch information from package manager site.
+
+        Args:
+            libname: Name of the package to fetch information regarding
+            deadline: Monotonic time after which the fetch fails, if any
+
+        Returns:
+            Any: The metadata of the library, an empty dict if the index does
+            not have it, ``None`` if the lookup failed
+        """
+        try:
+            with span("fetch", package=libname):
+                output = self._read(libname, deadline)
+
+            info = output.get("info") or {}
+            if self._reads_urls(libname):
+                info[URLS_READ] = True
+            wheels = [
+                x["url"]
+                for x in output.get("urls") or []
+                if x.get("packagetype") == "bdist_wheel"
+            ]
+            if wheels:
+                info["wheel_url"] = wheels[0]
+            return info
+
+        except Exception as error:
+            if isinstance(error, HTTPError) and error.code == 404:
+                return {}
+            # Still throttled after the retries: a failed lookup like any other
+            logger.warning(f"{libname}: error in fetching metadata")
+            return None
+
+    def _read(self, libname: str, deadline: Optional[float]) -> Dict[str, Any]:
+        """Request the metadata within the concurrency limit.
+
+        Throttled requests are retried after the ``Retry-After`` of the index.
+
+        Args:
+            libname: Name of the package to fetch information regarding
+            deadline: Monotonic time after which the request fails, if any
+
+        Returns:
+            Dict[str, Any]: The ``info`` and, if needed, ``urls`` of the response
+
+        Raises:
+            TimeoutError: If the deadline passes while waiting for a slot or
+                reading the response
+        """
+        lib_url = self.library_url.replace("XXX", libname)
+        members = ["info", "urls"] if self._reads_urls(libname) else ["info"]
+        attempt = 0
+        while True:
+            with span("fetch.wait", package=libname):
+                acquired = self.limit.acquire(time_left(deadline))
+            if not acquired:
+                raise TimeoutError(f"{libname}: deadline reached")
+            timeout = time_left(deadline)
+            if timeout is None or timeout > FETCH_TIMEOUT:
+                timeout = FETCH_TIMEOUT
+            started, latency, size = time.perf_counter(), None, 0
+            try:
+                with span("fetch.network", package=libname, attempt=attempt):
+                    with urlopen(lib_url, timeout=timeout) as response:
+                        reader = JsonMemberReader(
+                            response, self.max_response_size, deadline=deadline
+                        )
+                        output = reader.read_members(members)
+                latency, size = time.perf_counter() - started, reader.size
+                return output
+            except HTTPError as error:
+                if error.code not in THROTTLED_STATUSES or attempt >= self.retries:
+                    raise
+                self.limit.throttle(parse_retry_after(error.headers.get("Retry-After")))
+                attempt += 1
+            finally:
+                self.limit.release(latency)
+                self.timings.record(libname, time.perf_counter() - started, size)
+
+
+def build_sources(
+    specs: List[str],
+    cache: MetadataCache,
+    workers: int = 8,
+    timings: Optional[FetchTimings] = None,
+) -> List[MetadataSource]:
+    """Build a chain of metadata sources from their specifications.
+
+    Args:
+        specs: Ordered sources, each ``installed``, ``cache``, ``pypi`` or the
+            base URL of an index serving the PyPI JSON API
+        cache: The metadata cache
+        workers: Initial number of packages to fetch concurrently from an index
+        timings: History of fetch timings to schedule index fetches by
+
+    Returns:
+        List[MetadataSource]: The metadata sources in order
+
+    Raises:
+        ValueError: If a source is not recognised
+    """
+    sources: List[MetadataSource] = []
+    for spec in specs:
+        if spec == "installed":
+            sources.append(InstalledSource())
+        elif spec == "cache":
+            sources.append(CacheSource(cache))
+        elif spec == "pypi":
+            sources.append(IndexSource(PYPI_URL, workers, timings))
+        elif spec.startswith(("http://", "https://", "file://")):
+            sources.append(IndexSource(spec, workers, timings))
+        else:
+            raise ValueError(f"Unknown metadata source: {spec}")
+    return sources
@@ -0,0 +1,141 @@
+"""Adaptive limits on concurrent requests to package indexes."""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+#: HTTP statuses an index answers with when it is overloaded
+THROTTLED_STATUSES = (429, 503)
+
+
+def parse_retry_after(
+    value: Optional[str], default: float = 1.0, maximum: float = 60.0
+) -> float:
+    """Parse the ``Retry-After`` header of a throttled response.
+
+    Args:
+        value: The header, either seconds or an HTTP date
+        default: Seconds to wait if the header is missing or malformed
+        maximum: Longest wait honoured, in seconds
+
+    Returns:
+        float: Seconds to wait before retrying
+    """
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), maximum)
+
+
+class AdaptiveLimit:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease.
+
+    While latency stays within ``tolerance`` times the lowest latency seen,
+    the limit grows by about one per round of requests. It is cut by
+    ``backoff`` when latency rises beyond that or the server throttles, at
+    most once per round so a burst of slow responses counts as one signal.
+    A throttled server is not sent new requests until its ``Retry-After``.
+
+    Args:
+        initial: Initial number of concurrent requests
+        minimum: Lowest number of concurrent requests
+        maximum: Highest number of concurrent requests
+        backoff: Factor the limit is multiplied by on congestion
+        tolerance: Latency, relative to the lowest seen, considered healthy
+
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 32,
+        backoff: float = 0.5,
+        tolerance: float = 2.0,
+    ):
+        super().__init__()
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._baseline: Optional[float] = None
+        self._smoothed: Optional[float] = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a free slot under the limit.
+
+        Args:
+            timeout: Seconds to wait at most, waits indefinitely if ``None``
+
+        Returns:
+            bool: Whether a slot was acquired before the timeout
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                paused = self._paused_until - now
+                if paused <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return True
+                remaining = None if end is None else end - now
+                if remaining is not None and remaining <= 0:
+                    return False
+                waits = [x for x in (remaining, paused) if x is not None and x > 0]
+                self._condition.wait(min(waits) if waits else None)
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """Free a slot, adjusting the limit to the latency of the request.
+
+        Args:
+            latency: Seconds the request took, ``None`` if it failed
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._observe(latency)
+            self._condition.notify_all()
+
+    def throttle(self, retry_after: float) -> None:
+        """Back off after the server throttled a request.
+
+        Args:
+            retry_after: Seconds the server asked to wait
+        """
+        with self._condition:
+            self._decrease()
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _observe(self, latency: float) -> None:
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        else:
+            # Drift up slowly, so one lucky response does not skew it forever
+            self._baseline += 0.01 * (latency - self._baseline)
+        if self._smoothed is None:
+            self._smoothed = latency
+        self._smoothed += 0.2 * (latency - self._smoothed)
+
+        if self._smoothed > self.tolerance * self._baseline:
+            self._decrease()
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self._smoothed or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
@@ -0,0 +1,131 @@
+"""Timeline of a run in the Chrome trace event format."""
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from typing import ContextManager
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+
+class Tracer:
+    """Records spans of work, per thread, for Perfetto or chrome://tracing."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        """Record the time spent in a block.
+
+        Args:
+            name: Name of the span, such as ``fetch``
+            **args: Details shown with the span, such as the package
+
+        Yields:
+            None: While the block runs
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), **args)
+
+    def record(self, name: str, start: float, end: float, **args: Any) -> None:
+        """Record a span of the current thread.
+
+        Args:
+            name: Name of the span
+            start: ``time.perf_counter`` at the start of the span
+            end: ``time.perf_counter`` at the end of the span
+            **args: Details shown with the span
+        """
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+            if thread.ident is not None:
+                self._threads.setdefault(thread.ident, thread.name)
+
+    def write(self, path: Path) -> None:
+        """Write the spans as a Chrome trace event file.
+
+        Args:
+            path: File to write the trace to
+        """
+        with self._lock:
+            names = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._threads.items()
+            ]
+            events = names + self.events
+        path.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+        )
+
+
+_tracer: Optional[Tracer] = None
+_untraced = contextlib.nullcontext()
+
+
+def start_tracing() -> Tracer:
+    """Start recording spans of the whole process.
+
+    Returns:
+        Tracer: The tracer recording the spans
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """Stop recording spans.
+
+    Returns:
+        Optional[Tracer]: The tracer that recorded the spans, if any
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, **args: Any) -> ContextManager[None]:
+    """Record the time spent in a block, if tracing.
+
+    Costs a global lookup when not tracing.
+
+    Args:
+        name: Name of the span, such as ``fetch``
+        **args: Details shown with the span, such as the package
+
+    Returns:
+        ContextManager[None]: Context manager around the block
+    """
+    if _tracer is None:
+        return _untraced
+    return _tracer.span(name, **args)
@@ -1,5 +1,8 @@
 """Utility functions for loglicense module."""
 import fnmatch
+import hashlib
+import logging
+import re
 from collections import deque
 from pathlib import Path
 from typing import Any
@@ -10,9 +13,366 @@ from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Set
+from typing import Tuple
+from typing import Union
 
 import toml
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement
 from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+from loglicense.sbom import read_sbom
+
+
+logger = logging.getLogger("licenselogger")
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse a ``i/N`` shard specification.
+
+    Args:
+        spec: Shard given as ``index/count`` with a 1-based index
+
+    Returns:
+        Tuple[int, int]: The shard index and the total number of shards
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected i/N") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}, index must be within 1..{count}")
+    return index, count
+
+
+def parse_environment(spec: str) -> Dict[str, str]:
+    """Parse ``key=value`` marker variables of a target environment.
+
+    Args:
+        spec: Comma separated assignments, such as
+            ``python_version=3.8,sys_platform=win32``
+
+    Returns:
+        Dict[str, str]: The marker variables
+
+    Raises:
+        ValueError: If an assignment is malformed
+    """
+    environment = {}
+    for assignment in spec.split(","):
+        if not assignment.strip():
+            continue
+        key, sep, value = assignment.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid marker variable {assignment!r}, expected k=v")
+        environment[key.strip()] = value.strip()
+    return environment
+
+
+def in_shard(package: str, index: int, count: int) -> bool:
+    """Check whether a package belongs to the given shard.
+
+    The canonical package name (without version) is hashed, so a package
+    stays on the same shard across version bumps, spellings of its name and
+    machines.
+
+    Args:
+        package: Package key, either ``name`` or ``name/version``
+        index: 1-based shard index
+        count: Total number of shards
+
+    Returns:
+        bool: Whether the package is assigned to the shard
+    """
+    name = canonicalize_name(package.split("/")[0])
+    digest = hashlib.sha256(name.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count == index - 1
+
+
+def package_key(spec: str) -> str:
+    """Turn a package given as a requirement or as a key into a package key.
+
+    Args:
+        spec: ``name``, ``name/version`` or a requirement such as ``name==1.0``
+
+    Returns:
+        str: ``name/version`` for pinned requirements, ``name`` otherwise
+
+    Raises:
+        ValueError: If the requirement cannot be parsed
+    """
+    spec = spec.strip()
+    if "/" in spec:
+        return spec
+    try:
+        req = Requirement(spec)
+    except InvalidRequirement as error:
+        raise ValueError(f"Invalid package: {spec}") from error
+    version = RequirementsCollector.pinned_version(req)
+    return f"{req.name}/{version}" if version else req.name
+
+
+def diff_packages(
+    old: List[str], new: List[str]
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Pair up the packages of two versions of a dependency file.
+
+    Args:
+        old: Package keys (``name`` or ``name/version``) of the old version
+        new: Package keys of the new version
+
+    Returns:
+        List[Tuple[Optional[str], Optional[str]]]: Old and new key of every
+        added, removed or version-changed package, with ``None`` for the
+        missing side. Packages of the new version come first, in file order.
+    """
+    old_keys = {canonicalize_name(x.split("/")[0]): x for x in old}
+    new_keys = {canonicalize_name(x.split("/")[0]): x for x in new}
+    changes: List[Tuple[Optional[str], Optional[str]]] = [
+        (old_keys.get(name), key)
+        for name, key in new_keys.items()
+        if name not in old_keys or old_keys[name].split("/")[1:] != key.split("/")[1:]
+    ]
+    changes.extend(
+        (key, None) for name, key in old_keys.items() if name not in new_keys
+    )
+    return changes
+
+
+def active_requirements(
+    requires_dist: Optional[Iterable[str]],
+    environment: Optional[Dict[str, str]] = None,
+    extras: Iterable[str] = (),
+) -> List[Requirement]:
+    """Select the requirements of a package that apply to an environment.
+
+    Args:
+        requires_dist: ``Requires-Dist`` entries of the package metadata
+        environment: Marker variables of the target environment, overriding
+            those of the running interpreter
+        extras: Extras of the package that are requested
+
+    Returns:
+        List[Requirement]: Requirements whose markers hold in the environment
+    """
+    marker_env = {key: str(value) for key, value in default_environment().items()}
+    marker_env.update(environment or {})
+    output = []
+    for entry in requires_dist or []:
+        try:
+            req = Requirement(entry)
+        except InvalidRequirement:
+            logger.warning(f"{entry}: ignoring invalid requirement")
+            continue
+        if req.marker is None or any(
+            req.marker.evaluate({**marker_env, "extra": extra})
+            for extra in (*extras, "")
+        ):
+            output.append(req)
+    return output
+
+
+def propagate_bitsets(
+    adjacency: Dict[str, Set[str]], seeds: Dict[str, int]
+) -> Dict[str, int]:
+    """Propagate bitsets of roots along the edges of a dependency graph.
+
+    Every root is a bit, so the roots reaching each node are found in one
+    pass over the graph rather than one traversal per root. A node is only
+    visited again when its bitset grows.
+
+    Args:
+        adjacency: Dependencies of each node
+        seeds: Bits of the roots depending on each node directly
+
+    Returns:
+        Dict[str, int]: Bits of the roots reaching each node
+    """
+    bits = dict(seeds)
+    pending = deque(seeds)
+    while pending:
+        node = pending.popleft()
+        for dependency in adjacency.get(node, ()):
+            current = bits.get(dependency, 0)
+            if current | bits[node] != current:
+                bits[dependency] = current | bits[node]
+                pending.append(dependency)
+    return bits
+
+
+def _uv_dependency_names(deps: Any) -> Set[str]:
+    return {x["name"] for x in deps or [] if isinstance(x, dict) and x.get("name")}
+
+
+def uv_member_attribution(
+    license_path: Path, develop: bool = False
+) -> Dict[str, List[str]]:
+    """Attribute the packages of a uv.lock to the workspace members using them.
+
+    Workspace members are the entries whose source is `editable` or
+    `virtual`. The members reaching each package, directly or through other
+    packages and members, are found with :func:`propagate_bitsets`.
+
+    Args:
+        license_path: Path to the uv.lock file
+        develop: Whether to follow the dev-dependencies of the members and
+            list packages that no member reaches
+
+    Returns:
+        Dict[str, List[str]]: Names of the members using each package, by
+        package key in lock file order. Without members, every package is
+        listed with no members.
+    """
+    packages = [
+        x for x in toml.load(license_path).get("package") or [] if x.get("name")
+    ]
+    members = [
+        x["name"]
+        for x in packages
+        if isinstance(x.get("source"), dict)
+        and ("editable" in x["source"] or "virtual" in x["source"])
+    ]
+    member_bits = {name: 1 << i for i, name in enumerate(members)}
+    adjacency: Dict[str, Set[str]] = {}
+    seeds: Dict[str, int] = {}
+    for pkg in packages:
+        direct = _uv_dependency_names(pkg.get("dependencies"))
+        adjacency.setdefault(pkg["name"], set()).update(direct)
+        if pkg["name"] not in member_bits:
+            continue
+        if develop:
+            for group_deps in (pkg.get("dev-dependencies") or {}).values():
+                direct |= _uv_dependency_names(group_deps)
+        for name in direct:
+            seeds[name] = seeds.get(name, 0) | member_bits[pkg["name"]]
+    bits = propagate_bitsets(adjacency, seeds)
+
+    output = {}
+    for pkg in packages:
+        mask = bits.get(pkg["name"], 0)
+        if pkg["name"] in member_bits or not (mask or develop or not members):
+            continue
+        key = f"{pkg['name']}/{pkg['version']}" if pkg.get("version") else pkg["name"]
+        output[key] = [x for i, x in enumerate(members) if mask >> i & 1]
+    return output
+
+
+class RequirementsCollector:
+    """Collects the requirements of layered requirements files.
+
+    Every file is read at most once, however many files include it, and the
+    requirements are deduplicated by their canonical name, preferring pinned
+    occurrences. Constraint files only contribute version pins, following
+    pip's semantics.
+    """
+
+    _INCLUDE = re.compile(
+        r"^(?:-(?P<short>[rc])\s*=?\s*"
+        r"|--(?P<long>requirement|constraint)(?:\s*=\s*|\s+))"
+        r"(?P<path>\S+)"
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._parsed: Dict[Path, List[Union[Requirement, Tuple[bool, Path]]]] = {}
+        self._visited: Set[Tuple[Path, bool]] = set()
+        self._requirements: Dict[str, Requirement] = {}
+        self._pins: Dict[str, str] = {}
+
+    def collect(self, path: Path, constraint: bool = False) -> None:
+        """Collect the requirements of a file and the files it includes.
+
+        Args:
+            path: Requirements file to read
+            constraint: Whether the file is a constraints file
+        """
+        self._visit(path.resolve(), constraint, [])
+
+    def _visit(self, path: Path, constraint: bool, active: List[Path]) -> None:
+        if path in active:
+            logger.warning(f"{path}: ignoring circular requirements include")
+            return
+        if (path, constraint) in self._visited:
+            return
+        self._visited.add((path, constraint))
+
+        if path not in self._parsed:
+            self._parsed[path] = self._read(path)
+
+        for entry in self._parsed[path]:
+            if isinstance(entry, tuple):
+                include_constraint, include = entry
+                self._visit(include, constraint or include_constraint, active + [path])
+            elif constraint:
+                self._pins.setdefault(
+                    canonicalize_name(entry.name), self.pinned_version(entry) or ""
+                )
+            else:
+                name = canonicalize_name(entry.name)
+                known = self._requirements.setdefault(name, entry)
+                if self.pinned_version(entry) and not self.pinned_version(known):
+                    self._requirements[name] = entry
+
+    @classmethod
+    def _read(cls, path: Path) -> List[Union[Requirement, Tuple[bool, Path]]]:
+        entries: List[Union[Requirement, Tuple[bool, Path]]] = []
+        with path.open() as requirements_txt:
+            content = requirements_txt.read().replace("\\\n", "")
+        for raw in content.splitlines():
+            line = raw.split("#", 1)[0].strip()
+            match = cls._INCLUDE.match(line)
+            if match:
+                constraint = (match["short"] or match["long"][0]) == "c"
+                entries.append((constraint, (path.parent / match["path"]).resolve()))
+            else:
+                entries.extend(DependencyFileParser._parse_requirements([line]))
+        return entries
+
+    @classmethod
+    def includes(cls, content: str) -> List[str]:
+        """List the files a requirements file includes or constrains with.
+
+        Args:
+            content: Content of the requirements file
+
+        Returns:
+            List[str]: Paths of the included files, relative to the file
+        """
+        lines = content.replace("\\\n", "").splitlines()
+        matches = [cls._INCLUDE.match(x.split("#", 1)[0].strip()) for x in lines]
+        return [x["path"] for x in matches if x]
+
+    @staticmethod
+    def pinned_version(req: Requirement) -> Optional[str]:
+        """Get the exact version a requirement is pinned to.
+
+        Args:
+            req: Parsed requirement
+
+        Returns:
+            Optional[str]: The pinned version, ``None`` if not pinned
+        """
+        specifiers = list(req.specifier)
+        if len(specifiers) == 1 and specifiers[0].operator in ("==", "==="):
+            if "*" not in specifiers[0].version:
+                return specifiers[0].version
+        return None
+
+    def packages(self) -> List[str]:
+        """List the collected requirements.
+
+        Returns:
+            List[str]: Package keys, ``name/version`` for pinned packages
+        """
+        output = []
+        for name, req in self._requirements.items():
+            version = self.pinned_version(req) or self._pins.get(name)
+            output.append(f"{req.name}/{version}" if version else req.name)
+        return output
 
 
 class DependencyFileParser:
@@ -21,6 +381,9 @@ class DependencyFileParser:
     _FUZZY_PATTERNS = (
         ("uv*.lock", "uv.lock"),
         ("poetry*.lock", "poetry.lock"),
+        ("*.cdx.json", "bom.json"),
+        ("*.spdx.json", "bom.json"),
+        ("pip-inspect.json", "bom.json"),
     )
 
     def __init__(self) -> None:
@@ -86,6 +449,21 @@ class DependencyFileParser:
         )
         return dependency_filename
 
+    @staticmethod
+    def parse_bom_json(license_path: Path, develop: bool = False) -> List[str]:
+        """Parser for CycloneDX and SPDX SBOMs and pip inspect reports in JSON.
+
+        The file is streamed, so memory use does not grow with its size.
+
+        Args:
+            license_path: Path to the SBOM or pip inspect report
+            develop: Unused, SBOMs list what is installed
+
+        Returns:
+            List[str]: Package keys, ``name/version`` when the version is known
+        """
+        return list(read_sbom(license_path))
+
     @staticmethod
     def parse_poetry_lock(license_path: Path, develop: bool = False) -> List[str]:
         """Parser for poetry.lock files.
@@ -117,6 +495,10 @@ class DependencyFileParser:
     def parse_requirements_txt(license_path: Path, develop: bool = False) -> List[str]:
         """Parser for requirements.txt files.
 
+        Follows ``-r``/``--requirement`` includes recursively and applies the
+        pins of ``-c``/``--constraint`` files to the requirements found.
+        Pinned (``==``) versions are kept as ``name/version``.
+
         Args:
             license_path: Path to license file (requirements.txt)
             develop: Whether to include development dependencies (requirements_dev.txt)
@@ -124,26 +506,15 @@ class DependencyFileParser:
         Returns:
             List[str]: List of the names of python depedencies in requirements file
         """
-        output: List[str] = []
-
-        with license_path.open() as requirements_txt:
-            output = [
-                req.name
-                for req in DependencyFileParser._parse_requirements(requirements_txt)
-            ]
+        collector = RequirementsCollector()
+        collector.collect(license_path)
 
         if develop:
             dev_license_path = Path(str(license_path.absolute())[:-4] + "_dev.txt")
             if dev_license_path.is_file():
-                with dev_license_path.open() as requirements_txt:
-                    output.extend(
-                        req.name
-                        for req in DependencyFileParser._parse_requirements(
-                            requirements_txt
-                        )
-                    )
+                collector.collect(dev_license_path)
 
-        return output
+        return collector.packages()
 
     @staticmethod
     def parse_pyproject_toml(license_path: Path, develop: bool = False) -> List[str]:
@@ -194,11 +565,11 @@ class DependencyFileParser:
     def parse_uv_lock(license_path: Path, develop: bool = False) -> List[str]:
         """Parser for uv.lock files.
 
-        Identifies the editable/virtual project root (the entry whose source
-        is `editable` or `virtual`), reads its `dependencies` and
-        `[package.dev-dependencies]` to determine direct main vs dev roots,
-        then walks the resolved package list to filter out dev-only packages
-        when ``develop=False``.
+        Every workspace member (an entry whose source is `editable` or
+        `virtual`) is a root. Their `dependencies`, and with ``develop`` their
+        `[package.dev-dependencies]`, are followed through the resolved
+        package list to leave out packages only needed for development.
+        Members themselves are not listed.
 
         Markers on dep edges are ignored (treated as always-reachable, matching
         the "include all resolved" stance of poetry.lock parsing). Extras
@@ -212,66 +583,4 @@ class DependencyFileParser:
         Returns:
             List[str]: List of the names of python dependencies in uv.lock file
         """
-        license_file = toml.load(license_path)
-        packages: List[Dict[str, Any]] = license_file.get("package", []) or []
-
-        root: Optional[Dict[str, Any]] = None
-        for pkg in packages:
-            source = pkg.get("source") or {}
-            if isinstance(source, dict) and ("editable" in source or "virtual" in source):
-                root = pkg
-                break
-
-        def _emit(pkg: Dict[str, Any]) -> str:
-            name = pkg.get("name", "")
-            version = pkg.get("version", "")
-            return f"{name}/{version}" if version else name
-
-        if root is None:
-            return [_emit(pkg) for pkg in packages if pkg.get("name")]
-
-        root_name = root.get("name", "")
-
-        adjacency: Dict[str, Set[str]] = {}
-        for pkg in packages:
-            name = pkg.get("name")
-            if not name:
-                continue
-            edges = adjacency.setdefault(name, set())
-            for dep in pkg.get("dependencies", []) or []:
-                dep_name = dep.get("name") if isinstance(dep, dict) else None
-                if dep_name:
-                    edges.add(dep_name)
-
-        def _direct_names(deps: Any) -> Set[str]:
-            result: Set[str] = set()
-            for dep in deps or []:
-                if isinstance(dep, dict) and dep.get("name"):
-                    result.add(dep["name"])
-            return result
-
-        main_roots = _direct_names(root.get("dependencies"))
-
-        dev_roots: Set[str] = set()
-        for group_deps in (root.get("dev-dependencies") or {}).values():
-            dev_roots |= _direct_names(group_deps)
-
-        def _reachable(starts: Set[str]) -> Set[str]:
-            seen: Set[str] = set()
-            queue: deque = deque(starts)
-            while queue:
-                node = queue.popleft()
-                if node in seen:
-                    continue
-                seen.add(node)
-                for nxt in adjacency.get(node, ()):
-                    if nxt not in seen:
-                        queue.append(nxt)
-            return seen
-
-        if develop:
-            keep = {pkg.get("name") for pkg in packages if pkg.get("name")} - {root_name}
-        else:
-            keep = _reachable(main_roots) - {root_name}
-
-        return [_emit(pkg) for pkg in packages if pkg.get("name") in keep]
+        return list(uv_member_attribution(license_path, develop))
@@ -0,0 +1,190 @@
+"""Waiting for files to change."""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Type
+
+
+# struct inotify_event, followed by the name of the file
+_INOTIFY_EVENT = struct.Struct("iIII")
+# IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE and IN_DELETE
+_INOTIFY_MASK = 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+
+def _load_inotify() -> Optional[Any]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    """Waits for files to change.
+
+    Uses inotify where available, watching the directories of the files so
+    that editors replacing a file on save are noticed too. Elsewhere, the
+    modification time and size of the files are polled.
+
+    Args:
+        paths: Files to watch, which do not need to exist
+        interval: Seconds between polls when inotify is not available
+        settle: Seconds to wait for further changes after a change, so a
+            save touching a file several times is reported once
+        use_inotify: Whether to use inotify where available
+
+    """
+
+    def __init__(
+        self,
+        paths: List[Path],
+        interval: float = 0.5,
+        settle: float = 0.05,
+        use_inotify: bool = True,
+    ):
+        super().__init__()
+        self.paths = {Path(os.path.abspath(x)) for x in paths}
+        self.interval = interval
+        self.settle = settle
+        self._fd: Optional[int] = None
+        self._directories: Dict[int, Path] = {}
+        self._snapshot = self._stat()
+        libc = _load_inotify() if use_inotify else None
+        if libc is not None:
+            self._start_inotify(libc)
+
+    def __enter__(self) -> "FileWatcher":
+        """Use the watcher as a context manager.
+
+        Returns:
+            FileWatcher: The watcher itself
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Stop watching.
+
+        Args:
+            exc_type: Type of the exception raised in the block, if any
+            exc_value: Exception raised in the block, if any
+            traceback: Traceback of the exception, if any
+        """
+        self.close()
+
+    @property
+    def uses_inotify(self) -> bool:
+        """Whether changes are noticed through inotify.
+
+        Returns:
+            bool: Whether inotify is used instead of polling
+        """
+        return self._fd is not None
+
+    def wait(self, timeout: Optional[float] = None) -> List[Path]:
+        """Wait until any of the files changes.
+
+        Args:
+            timeout: Seconds to wait at most, waits indefinitely if ``None``
+
+        Returns:
+            List[Path]: The changed files, empty if the timeout passed
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if end is None else max(0.0, end - time.monotonic())
+            changed = self._poll(remaining)
+            if changed:
+                return sorted(changed)
+            if remaining == 0.0:
+                return []
+
+    def close(self) -> None:
+        """Stop watching."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _start_inotify(self, libc: Any) -> None:
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return
+        for directory in {x.parent for x in self.paths}:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), _INOTIFY_MASK)
+            if wd < 0:
+                os.close(fd)
+                self._directories.clear()
+                return
+            self._directories[wd] = directory
+        self._fd = fd
+
+    def _poll(self, timeout: Optional[float]) -> Set[Path]:
+        if self._fd is None:
+            return self._poll_stat(timeout)
+        changed = self._read_events(timeout)
+        while changed:
+            more = self._read_events(self.settle)
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def _read_events(self, timeout: Optional[float]) -> Set[Path]:
+        if self._fd is None:
+            return set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self._fd, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if wd in self._directories:
+                changed.add(self._directories[wd] / name)
+        return changed & self.paths
+
+    def _stat(self) -> Dict[Path, Optional[Tuple[int, int]]]:
+        snapshot: Dict[Path, Optional[Tuple[int, int]]] = {}
+        for path in self.paths:
+            try:
+                stat = path.stat()
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                snapshot[path] = None
+        return snapshot
+
+    def _poll_stat(self, timeout: Optional[float]) -> Set[Path]:
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._stat()
+            changed = {x for x in self.paths if snapshot[x] != self._snapshot[x]}
+            if changed:
+                self._snapshot = snapshot
+                return changed
+            if end is not None and time.monotonic() >= end:
+                return set()
+            time.sleep(self.interval)
@@ -0,0 +1,238 @@
+"""Reading license files from remote wheels with HTTP range requests."""
+import fnmatch
+import io
+import logging
+import re
+import time
+import zipfile
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from urllib.request import Request
+from urllib.request import urlopen
+
+
+logger = logging.getLogger("licenselogger")
+
+LICENSE_MEMBERS = (
+    "*.dist-info/licenses/*",
+    "*.dist-info/LICENSE*",
+    "*.dist-info/LICENCE*",
+    "*.dist-info/COPYING*",
+)
+# Checked in order, so texts come before the shorter texts they contain
+LICENSE_TEXTS = (
+    ("GNU AFFERO GENERAL PUBLIC LICENSE", "AGPL-3.0"),
+    ("GNU LESSER GENERAL PUBLIC LICENSE", "LGPL"),
+    ("GNU GENERAL PUBLIC LICENSE.{0,200}Version 3", "GPL-3.0"),
+    ("GNU GENERAL PUBLIC LICENSE.{0,200}Version 2", "GPL-2.0"),
+    ("Apache License.{0,200}Version 2\\.0", "Apache-2.0"),
+    ("Mozilla Public License,? (Version )?2\\.0", "MPL-2.0"),
+    ("PYTHON SOFTWARE FOUNDATION LICENSE", "PSF-2.0"),
+    ("Permission is hereby granted, free of charge", "MIT"),
+    ("Permission to use, copy, modify, and/or distribute", "ISC"),
+    ("Neither the name of", "BSD-3-Clause"),
+    ("Redistribution and use in source and binary forms", "BSD-2-Clause"),
+    ("free and unencumbered software released into the public domain", "Unlicense"),
+)
+_VAGUE_LICENSE = re.compile(
+    r"^\s*$|^unknown$|^other|\bsee\b|license file|\.(txt|md|rst)\b", re.IGNORECASE
+)
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """Read-only, seekable file over HTTP range requests.
+
+    The tail of the file is fetched up front, as zip readers start from the
+    central directory at the end. Other reads fetch at least ``block_size``
+    bytes from the read position.
+
+    Args:
+        url: URL of a file on a server supporting range requests
+        tail_size: Number of bytes to fetch from the end of the file up front
+        block_size: Minimum number of bytes to fetch per request
+        timeout: Timeout of each request in seconds
+        deadline: Monotonic time after which requests fail, bounding all the
+            requests together, if any
+
+    """
+
+    def __init__(
+        self,
+        url: str,
+        tail_size: int = 65536,
+        block_size: int = 65536,
+        timeout: float = 30.0,
+        deadline: Optional[float] = None,
+    ):
+        super().__init__()
+        self.url = url
+        self.block_size = block_size
+        self.timeout = timeout
+        self.deadline = deadline
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._pos = 0
+        self._buffer_start, self._buffer, self.size = self._request(f"-{tail_size}")
+
+    def _request(self, byte_range: str) -> Tuple[int, bytes, int]:
+        timeout = self.timeout
+        if self.deadline is not None:
+            timeout = min(timeout, self.deadline - time.monotonic())
+            if timeout <= 0:
+                raise TimeoutError(f"{self.url}: deadline reached")
+        request = Request(self.url, headers={"Range": f"bytes={byte_range}"})
+        with urlopen(request, timeout=timeout) as response:
+            content_range = response.headers.get("Content-Range", "")
+            match = re.match(r"bytes (\d+)-\d+/(\d+)", content_range)
+            if response.status != 206 or match is None:
+                raise OSError(f"{self.url}: server does not support range requests")
+            data = response.read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return int(match[1]), data, int(match[2])
+
+    def readable(self) -> bool:
+        """Whether the file is readable.
+
+        Returns:
+            bool: Always true
+        """
+        return True
+
+    def seekable(self) -> bool:
+        """Whether the file is seekable.
+
+        Returns:
+            bool: Always true
+        """
+        return True
+
+    def tell(self) -> int:
+        """Current position in the file.
+
+        Returns:
+            int: The position
+        """
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Change the position in the file.
+
+        Args:
+            offset: Offset relative to ``whence``
+            whence: ``SEEK_SET``, ``SEEK_CUR`` or ``SEEK_END``
+
+        Returns:
+            int: The new position
+        """
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}
+        self._pos = max(0, base[whence] + offset)
+        return self._pos
+
+    def readinto(self, buffer: Any) -> int:
+        """Read bytes into a buffer, fetching them if not buffered.
+
+        Args:
+            buffer: Writable buffer to read into
+
+        Returns:
+            int: Number of bytes read
+        """
+        size = min(len(buffer), self.size - self._pos)
+        if size <= 0:
+            return 0
+        offset = self._pos - self._buffer_start
+        if offset < 0 or offset + size > len(self._buffer):
+            end = min(self.size, self._pos + max(size, self.block_size)) - 1
+            self._buffer_start, self._buffer, _ = self._request(f"{self._pos}-{end}")
+            offset = self._pos - self._buffer_start
+        chunk = self._buffer[offset : offset + size]
+        buffer[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+
+def read_license_files(
+    url: str,
+    max_size: int = 262144,
+    timeout: float = 30.0,
+    deadline: Optional[float] = None,
+) -> Dict[str, str]:
+    """Read the license files of a remote wheel without downloading it.
+
+    Only the central directory and the matching members are fetched.
+
+    Args:
+        url: URL of the wheel
+        max_size: Largest license file to read, in bytes
+        timeout: Timeout of each request in seconds
+        deadline: Monotonic time after which requests fail, if any
+
+    Returns:
+        Dict[str, str]: Text of each license file by member name
+    """
+    remote = HTTPRangeFile(url, timeout=timeout, deadline=deadline)
+    with zipfile.ZipFile(remote) as wheel:
+        return {
+            member.filename: wheel.read(member).decode("utf-8", "replace")
+            for member in wheel.infolist()
+            if member.file_size <= max_size
+            and any(fnmatch.fnmatch(member.filename, x) for x in LICENSE_MEMBERS)
+        }
+
+
+def detect_license(text: str) -> Optional[str]:
+    """Identify a license from its text.
+
+    Args:
+        text: Full text of a license file
+
+    Returns:
+        Optional[str]: SPDX-like identifier of the license, if recognised
+    """
+    normalised = " ".join(text.split())
+    for pattern, identifier in LICENSE_TEXTS:
+        if re.search(pattern, normalised, re.IGNORECASE):
+            return identifier
+    return None
+
+
+def needs_deep_license(pkg_metadata: Dict[str, Any]) -> bool:
+    """Check whether metadata lacks a usable license.
+
+    Args:
+        pkg_metadata: Metadata of a library in the shape of the PyPI JSON API
+
+    Returns:
+        bool: Whether the license should be read from the license files
+    """
+    if pkg_metadata.get("license_expression"):
+        return False
+    if any(x.startswith("License") for x in pkg_metadata.get("classifiers") or []):
+        return False
+    return bool(_VAGUE_LICENSE.search(pkg_metadata.get("license") or ""))
+
+
+def wheel_license(
+    url: str, timeout: float = 30.0, deadline: Optional[float] = None
+) -> Optional[str]:
+    """Detect the licenses of a remote wheel from its license files.
+
+    Args:
+        url: URL of the wheel
+        timeout: Timeout of each request in seconds
+        deadline: Monotonic time after which requests fail, if any
+
+    Returns:
+        Optional[str]: Newline separated licenses, ``None`` if none detected
+    """
+    try:
+        texts = read_license_files(url, timeout=timeout, deadline=deadline)
+    except Exception:
+        logger.warning(f"{url}: error in reading license files")
+        return None
+    detected = [detect_license(x) for x in texts.values()]
+    licenses = list(dict.fromkeys(x for x in detected if x))
+    return "\n".join(licenses) or None
@@ -0,0 +1,21 @@
+"""Fixtures shared by the test suite."""
+from pathlib import Path
+
+from pytest import MonkeyPatch
+from pytest import fixture
+
+
+@fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch: MonkeyPatch) -> Path:
+    """Keep the metadata cache of every test in its temporary directory.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+
+    Returns:
+        Path: The cache directory of the test
+    """
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("LOGLICENSE_CACHE_DIR", str(cache_dir))
+    return cache_dir
@@ -1,9 +1,23 @@
 """Test cases for the __main__ module."""
+import io
+import json
+import subprocess  # noqa: S404
+import tarfile
+import threading
+import time
+import zipfile
 from pathlib import Path
+from typing import Any
+from typing import List
+from typing import Optional
 
+from pytest import MonkeyPatch
+from pytest import fixture
 from typer.testing import CliRunner
 
 from loglicense.__main__ import app
+from loglicense.policy import UNRESOLVED_LICENSE
+from loglicense.sources import IndexSource
 
 
 runner = CliRunner()
@@ -232,3 +246,666 @@ coverage = 100"""
         ],
     )
     assert result.exit_code == 2
+
+
+FAKE_METADATA = {
+    "alabaster": {"name": "alabaster", "version": "0.7.12", "license": "BSD"},
+    "atomicwrites": {"name": "atomicwrites", "version": "1.4.0", "license": "MIT"},
+    "agplpkg": {"name": "agplpkg", "version": "2.0", "license": "AGPL"},
+}
+
+
+def fake_license_metadata(
+    self: IndexSource, libname: str, deadline: Optional[float] = None
+) -> Any:
+    """Offline stand-in for ``IndexSource.get_license_metadata``.
+
+    Args:
+        self: The package index source
+        libname: Name of the package to fetch information regarding
+        deadline: Ignored monotonic deadline of the fetch
+
+    Returns:
+        Any: The metadata of the library
+    """
+    return FAKE_METADATA.get(libname.split("/")[0])
+
+
+@fixture
+def lookups(monkeypatch: MonkeyPatch) -> List[str]:
+    """Answer index lookups offline, recording the package keys looked up.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+
+    Returns:
+        List[str]: The package keys looked up, in order
+    """
+    looked_up: List[str] = []
+
+    def counted_metadata(
+        self: IndexSource, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        looked_up.append(libname)
+        return fake_license_metadata(self, libname)
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", counted_metadata)
+    return looked_up
+
+
+def test_app_check_shard_merge(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Sharded checks merged together give the single-process verdict.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(IndexSource, "get_license_metadata", fake_license_metadata)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nallowed =\n    MIT,\ncoverage = 100\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster\natomicwrites\nagplpkg\nmissing\n")
+    base_args = ["--dependency-file", str(tmp_file), "--config-file", str(tmp_conf)]
+
+    single = runner.invoke(app, ["check", *base_args, "--show-report"])
+    shard_files = []
+    for index in (1, 2, 3):
+        shard_file = tmp_path / f"shard-{index}.json"
+        shard_files.append(str(shard_file))
+        result = runner.invoke(
+            app,
+            [
+                "check",
+                *base_args,
+                "--shard",
+                f"{index}/3",
+                "--shard-file",
+                str(shard_file),
+            ],
+        )
+        assert result.exit_code == 0
+    merged = runner.invoke(
+        app, ["merge", *shard_files, "--config-file", str(tmp_conf), "--show-report"]
+    )
+
+    assert single.exit_code == merged.exit_code == 2
+    assert merged.stdout == single.stdout
+
+    incomplete = runner.invoke(app, ["merge", *shard_files[:2]])
+    assert isinstance(incomplete.exception, ValueError)
+
+
+def test_app_merge_transitive_shards(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Dependencies shared by packages of several shards are merged once.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    requires = {"alabaster": ["six"], "atomicwrites": ["six"], "six": []}
+
+    def transitive_metadata(
+        self: IndexSource, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        return {"name": libname, "license": "MIT", "requires_dist": requires[libname]}
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", transitive_metadata)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nallowed = MIT\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster\natomicwrites\n")
+    base_args = ["--dependency-file", str(tmp_file), "--config-file", str(tmp_conf)]
+
+    shard_files = [str(tmp_path / f"shard-{x}.json") for x in (1, 2)]
+    for index, shard_file in enumerate(shard_files, 1):
+        shard_args = ["--shard", f"{index}/2", "--shard-file", shard_file]
+        result = runner.invoke(app, ["check", *base_args, "--transitive", *shard_args])
+        assert result.exit_code == 0
+    merged = runner.invoke(
+        app, ["merge", *shard_files, "--config-file", str(tmp_conf), "--show-report"]
+    )
+
+    assert merged.exit_code == 0
+    assert merged.stdout.count("| six ") == 1
+
+
+def test_app_cache_bundle_offline_check(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    """An exported cache bundle lets an offline machine run the check.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(IndexSource, "get_license_metadata", fake_license_metadata)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nallowed =\n    MIT,\n    BSD\ncoverage = 100\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster\natomicwrites\n")
+    bundle = str(tmp_path / "cache.json.gz")
+    online, offline = str(tmp_path / "online"), str(tmp_path / "offline")
+
+    result = runner.invoke(
+        app, ["cache", "prefetch", str(tmp_file), "--cache-dir", online]
+    )
+    assert result.exit_code == 0
+    assert "2/2" in result.stdout
+    result = runner.invoke(app, ["cache", "export", bundle, "--cache-dir", online])
+    assert result.exit_code == 0
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", None)
+    check_args = [
+        "check",
+        "--dependency-file",
+        str(tmp_file),
+        "--config-file",
+        str(tmp_conf),
+        "--cache-dir",
+        offline,
+        "--offline",
+    ]
+    assert runner.invoke(app, check_args).exit_code == 2
+    result = runner.invoke(app, ["cache", "import", bundle, "--cache-dir", offline])
+    assert "Imported 2 entries" in result.stdout
+    assert runner.invoke(app, check_args).exit_code == 0
+
+
+def test_app_run_fetches_once(tmp_path: Path, lookups: List[str]) -> None:
+    """The run command reports and checks from a single fetch per package.
+
+    Args:
+        tmp_path: Path to temporary directory
+        lookups: Packages looked up on the index
+    """
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nbanned =\n    AGPL,\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster==0.7.12\natomicwrites==1.4.0\nagplpkg==2.0\n")
+
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--dependency-file",
+            str(tmp_file),
+            "--config-file",
+            str(tmp_conf),
+            "--info-columns",
+            "name,version,license",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "| agplpkg      | 2.0       | AGPL      |" in result.stdout
+    assert sorted(lookups) == ["agplpkg/2.0", "alabaster/0.7.12", "atomicwrites/1.4.0"]
+
+
+def test_app_check_fail_fast(tmp_path: Path, lookups: List[str]) -> None:
+    """A fail-fast check stops fetching at the first banned license.
+
+    Args:
+        tmp_path: Path to temporary directory
+        lookups: Packages looked up on the index
+    """
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nbanned =\n    AGPL,\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("agplpkg==2.0\nalabaster==0.7.12\natomicwrites==1.4.0\n")
+
+    result = runner.invoke(
+        app,
+        [
+            "check",
+            "--dependency-file",
+            str(tmp_file),
+            "--config-file",
+            str(tmp_conf),
+            "--fail-fast",
+            "--workers",
+            "1",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "agplpkg: banned license AGPL" in result.stdout
+    assert lookups == ["agplpkg/2.0"]
+
+
+def test_app_check_fail_fast_concurrent(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    """A concurrent fail-fast check does not wait for fetches in flight.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    release = threading.Event()
+
+    def stalled_metadata(
+        self: IndexSource, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        if not libname.startswith("agplpkg"):
+            release.wait(10)
+        return fake_license_metadata(self, libname)
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", stalled_metadata)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nbanned =\n    AGPL,\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("agplpkg==2.0\nalabaster==0.7.12\natomicwrites==1.4.0\n")
+
+    start = time.monotonic()
+    try:
+        result = runner.invoke(
+            app,
+            [
+                "check",
+                "--dependency-file",
+                str(tmp_file),
+                "--config-file",
+                str(tmp_conf),
+                "--fail-fast",
+                "--workers",
+                "4",
+            ],
+        )
+        assert time.monotonic() - start < 5.0
+    finally:
+        release.set()
+
+    assert result.exit_code == 1
+    assert "agplpkg: banned license AGPL" in result.stdout
+
+
+def test_app_check_deadline(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Lookups outstanding at the deadline are reported as unresolved.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    release = threading.Event()
+
+    def stalled_metadata(
+        self: IndexSource, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        if libname.startswith("atomicwrites"):
+            release.wait(10)
+        return fake_license_metadata(self, libname)
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", stalled_metadata)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\ncoverage = 100\nunresolved = ignore\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster==0.7.12\natomicwrites==1.4.0\n")
+    output_file = tmp_path / "check.md"
+
+    result = runner.invoke(
+        app,
+        [
+            "check",
+            "--dependency-file",
+            str(tmp_file),
+            "--config-file",
+            str(tmp_conf),
+            "--output-file",
+            str(output_file),
+            "--deadline",
+            "0.5",
+        ],
+    )
+    release.set()
+
+    rows = [x.split("|")[1:-1] for x in output_file.read_text().splitlines()[4:]]
+    assert result.exit_code == 0
+    assert "actual coverage: 100% (1 unresolved)" in output_file.read_text()
+    assert [[x.strip() for x in row] for row in rows] == [
+        ["alabaster", "0.7.12", "BSD", "Allowed"],
+        ["atomicwrites", UNRESOLVED_LICENSE, UNRESOLVED_LICENSE, "Unresolved"],
+    ]
+
+
+def git(*args: str) -> None:
+    """Run git in the working directory.
+
+    Args:
+        *args: Arguments of git
+    """
+    subprocess.run(  # noqa: S603,S607
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args], check=True
+    )
+
+
+def test_app_diff_git_revision(
+    tmp_path: Path, monkeypatch: MonkeyPatch, lookups: List[str]
+) -> None:
+    """Only packages changed since a git revision are looked up.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+        lookups: Packages looked up on the index
+    """
+    monkeypatch.chdir(tmp_path)
+    Path(".loglicense").write_text("[loglicense]\nbanned =\n    AGPL,\n")
+    requirements = Path("requirements.txt")
+    requirements.write_text("-r base.txt\nalabaster==0.7.11\n")
+    Path("base.txt").write_text("atomicwrites==1.4.0\nsix==1.0\n")
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-qm", "Initial")
+    requirements.write_text("-r base.txt\nalabaster==0.7.12\nagplpkg==2.0\n")
+    Path("base.txt").write_text("atomicwrites==1.4.0\n")
+
+    result = runner.invoke(
+        app, ["diff", "HEAD", "--dependency-file", str(requirements)]
+    )
+
+    assert result.exit_code == 1
+    assert "3 changed packages, 1 banned licenses" in result.stdout
+    assert "| agplpkg   | Added           |" in result.stdout
+    assert "| six       | Removed         | 1.0" in result.stdout
+    assert sorted(lookups) == [
+        "agplpkg/2.0",
+        "alabaster/0.7.11",
+        "alabaster/0.7.12",
+        "six/1.0",
+    ]
+
+
+def test_app_history(
+    tmp_path: Path, monkeypatch: MonkeyPatch, lookups: List[str]
+) -> None:
+    """The license timeline looks every package version up once.
+
+    Includes are read at the same revision, and revisions that cannot be
+    parsed are skipped.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+        lookups: Packages looked up on the index
+    """
+    monkeypatch.chdir(tmp_path)
+    git("init", "-q")
+    requirements = Path("requirements.txt")
+    Path("extra.txt").write_text("agplpkg==2.0\n")
+    for content in (
+        "alabaster==0.7.12\n",
+        "-r extra.txt\nalabaster==0.7.12\n",
+        "alabaster==0.7.12\n",
+        "-r missing.txt\n",
+        "alabaster==0.7.12\natomicwrites==1.4.0\n",
+    ):
+        requirements.write_text(content)
+        git("add", ".")
+        git("commit", "-qm", "Update")
+
+    result = runner.invoke(app, ["history", str(requirements), "--tablefmt", "tsv"])
+
+    rows = [x.split("\t")[2:] for x in result.stdout.splitlines()[1:]]
+    assert result.exit_code == 0
+    assert [" ".join(x.strip() for x in row).split() for row in rows] == [
+        ["alabaster", "Added", "0.7.12", "BSD"],
+        ["agplpkg", "Added", "2.0", "AGPL"],
+        ["agplpkg", "Removed", "2.0", "AGPL"],
+        ["atomicwrites", "Added", "1.4.0", "MIT"],
+    ]
+    assert sorted(lookups) == ["agplpkg/2.0", "alabaster/0.7.12", "atomicwrites/1.4.0"]
+
+
+def test_app_report_wheelhouse(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """A wheelhouse is reported from the metadata inside its archives.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(IndexSource, "get_license_metadata", None)
+    wheelhouse = tmp_path / "wheelhouse"
+    wheelhouse.mkdir()
+    for name, metadata in (
+        ("alabaster", "Name: alabaster\nVersion: 0.7.12\nLicense: BSD\n"),
+        ("atomicwrites", "Name: atomicwrites\nVersion: 1.4.0\nLicense: MIT\n"),
+    ):
+        with zipfile.ZipFile(wheelhouse / f"{name}-py3-none-any.whl", "w") as wheel:
+            wheel.writestr(f"{name}/__init__.py", "")
+            wheel.writestr(f"{name}.dist-info/METADATA", metadata)
+    with tarfile.open(wheelhouse / "zipp-3.0.tar.gz", "w:gz") as sdist:
+        content = b"Name: zipp\nVersion: 3.0\nClassifier: License :: MIT License\n"
+        member = tarfile.TarInfo("zipp-3.0/PKG-INFO")
+        member.size = len(content)
+        sdist.addfile(member, io.BytesIO(content))
+
+    result = runner.invoke(
+        app, ["report", "--source", "wheelhouse", str(wheelhouse), "--workers", "2"]
+    )
+
+    assert result.exit_code == 0
+    assert (
+        """| Name         | License     |
+|:-------------|:------------|
+| alabaster    | BSD         |
+| atomicwrites | MIT         |
+| zipp         | MIT License |"""
+        in result.stdout
+    )
+
+
+def test_app_watch(tmp_path: Path, lookups: List[str]) -> None:
+    """Watch mode checks again on change, looking up only new packages.
+
+    Args:
+        tmp_path: Path to temporary directory
+        lookups: Packages looked up on the index
+    """
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nallowed = BSD, MIT\nbanned = AGPL\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster\natomicwrites\n")
+
+    def edit() -> None:
+        while not lookups:
+            threading.Event().wait(0.01)
+        threading.Event().wait(0.2)
+        tmp_file.write_text("alabaster\natomicwrites\nagplpkg\n")
+
+    editor = threading.Thread(target=edit)
+    editor.start()
+    result = runner.invoke(
+        app,
+        [
+            "watch",
+            "--dependency-file",
+            str(tmp_file),
+            "--config-file",
+            str(tmp_conf),
+            "--sources",
+            "pypi",
+            "--poll",
+            "--interval",
+            "0.05",
+            "--max-checks",
+            "2",
+        ],
+    )
+    editor.join()
+
+    first, second = result.stdout.split("\n", 1)
+    assert result.exit_code == 0
+    assert "OK: 2 packages" in first
+    assert "Banned licenses found: 3 packages" in second
+    assert "| agplpkg | 2.0       | AGPL      | Banned   |" in second
+    assert sorted(lookups) == ["agplpkg", "alabaster", "atomicwrites"]
+
+
+def test_app_inventory(
+    tmp_path: Path, monkeypatch: MonkeyPatch, lookups: List[str]
+) -> None:
+    """The inventory is appended to, looking up every package once.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+        lookups: Packages looked up on the index
+    """
+    monkeypatch.chdir(tmp_path)
+    Path(".loglicense").write_text("[loglicense]\nbanned = AGPL\n")
+    for repo, packages in (("a", "alabaster\n"), ("b", "alabaster\natomicwrites\n")):
+        Path(repo).mkdir()
+        Path(repo, "requirements.txt").write_text(packages)
+    args = ["inventory", "a/requirements.txt", "b/requirements.txt"]
+
+    first = runner.invoke(app, args + ["--sources", "pypi"])
+    Path("a/requirements.txt").write_text("alabaster\nagplpkg\n")
+    second = runner.invoke(app, args + ["--uses", "agpl"])
+    Path(".loglicense").write_text("[loglicense]\nbanned = GPL\n")
+    third = runner.invoke(app, args)
+
+    assert "Updated 2 of 2 dependency files" in first.stdout
+    assert "Updated 1 of 2 dependency files" in second.stdout
+    assert "| a/requirements.txt | agplpkg | 2.0       | AGPL      | Banned   |" in (
+        second.stdout
+    )
+    assert "b/requirements.txt" not in second.stdout
+    assert "Updated 2 of 2 dependency files" in third.stdout
+    assert sorted(lookups) == ["agplpkg", "alabaster", "atomicwrites"]
+
+
+def test_app_lock(tmp_path: Path, monkeypatch: MonkeyPatch, lookups: List[str]) -> None:
+    """Check verifies against the lock, only looking up unlocked packages.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+        lookups: Packages looked up on the index
+    """
+    monkeypatch.chdir(tmp_path)
+    Path(".loglicense").write_text("[loglicense]\nbanned = AGPL\n")
+    Path("requirements.txt").write_text("alabaster\natomicwrites\n")
+    args = ["--dependency-file", "requirements.txt", "--sources", "pypi"]
+
+    locked = runner.invoke(app, ["lock"] + args)
+    lock = json.loads(Path("loglicense.lock").read_text())
+    checked = runner.invoke(app, ["check"] + args)
+    Path("requirements.txt").write_text("alabaster\natomicwrites\nagplpkg\n")
+    drifted = runner.invoke(app, ["check"] + args)
+
+    assert "Locked 2 of 2 packages" in locked.stdout
+    assert lock["packages"]["alabaster"]["verdict"] == {"BSD": "Allowed"}
+    assert checked.exit_code == 0 and "license lock" not in checked.stdout
+    assert drifted.exit_code == 1
+    assert "1 packages not in the license lock" in drifted.stdout
+    assert lookups == ["alabaster", "atomicwrites", "agplpkg"]
+
+
+def test_app_check_members(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Each member of a uv workspace is judged on the packages it uses.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr(IndexSource, "get_license_metadata", fake_license_metadata)
+    monkeypatch.chdir(tmp_path)
+    Path(".loglicense").write_text("[loglicense]\nallowed = BSD\ncoverage = 100\n")
+    Path("uv.lock").write_text(
+        """
+[[package]]
+name = "api"
+source = { editable = "api" }
+dependencies = [{ name = "alabaster" }]
+
+[[package]]
+name = "worker"
+source = { virtual = "worker" }
+dependencies = [{ name = "alabaster" }, { name = "atomicwrites" }]
+
+[[package]]
+name = "alabaster"
+version = "0.7.12"
+
+[[package]]
+name = "atomicwrites"
+version = "1.4.0"
+"""
+    )
+
+    for extra_args in ([], ["--transitive"]):
+        result = runner.invoke(
+            app, ["check", "--members", "--sources", "pypi", *extra_args]
+        )
+
+        assert result.exit_code == 2
+        assert (
+            "| api      | 1          | 100%       | Passed         |" in result.stdout
+        )
+        assert (
+            "| worker   | 2          | 50%        | Below coverage |" in result.stdout
+        )
+
+    # Members are only known from a uv.lock
+    Path("requirements.txt").write_text("alabaster\n")
+    result = runner.invoke(
+        app, ["check", "--members", "--dependency-file", "requirements.txt"]
+    )
+
+    assert result.exit_code == 2
+    assert "member verdicts need a uv.lock dependency file" in result.output
+
+
+def test_app_trace_out(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """The run is written as a Chrome trace with a span per stage.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+
+    def fake_urlopen(url: str, timeout: Any) -> io.BytesIO:
+        name = url.split("/pypi/")[1].split("/")[0]
+        return io.BytesIO(json.dumps({"info": FAKE_METADATA[name]}).encode())
+
+    monkeypatch.setattr("loglicense.sources.urlopen", fake_urlopen)
+    tmp_conf = tmp_path / ".loglicense"
+    tmp_conf.write_text("[loglicense]\nallowed = BSD, MIT\n")
+    tmp_file = tmp_path / "requirements.txt"
+    tmp_file.write_text("alabaster\natomicwrites\n")
+    trace_file = tmp_path / "trace.json"
+
+    result = runner.invoke(
+        app,
+        [
+            "--trace-out",
+            str(trace_file),
+            "check",
+            "--dependency-file",
+            str(tmp_file),
+            "--config-file",
+            str(tmp_conf),
+            "--sources",
+            "pypi",
+            "--show-report",
+        ],
+    )
+
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    spans = [x for x in events if x["ph"] == "X"]
+    assert result.exit_code == 0
+    assert {x["name"] for x in spans} == {
+        "parse",
+        "resolve",
+        "fetch",
+        "fetch.wait",
+        "fetch.network",
+        "decode",
+        "validate",
+        "render",
+    }
+    assert sorted(x["args"]["package"] for x in spans if x["name"] == "fetch") == [
+        "alabaster",
+        "atomicwrites",
+    ]
+    assert {x["tid"] for x in events if x["ph"] == "M"} >= {x["tid"] for x in spans}
@@ -1,11 +1,42 @@
 """Test cases for the __main__ module."""
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import Literal
+from typing import Optional
+from urllib.error import HTTPError
+from urllib.error import URLError
 
 import pytest
 
 from loglicense import DependencyFileParser
 from loglicense import LicenseLogger
+from loglicense import PackageLicense
+from loglicense.cache import CacheEntry
+from loglicense.cache import FetchTimings
+from loglicense.cache import MetadataCache
+from loglicense.sources import FETCH_TIMEOUT
+from loglicense.sources import IndexSource
+from loglicense.sources import Lookup
+from loglicense.throttle import AdaptiveLimit
+from loglicense.throttle import parse_retry_after
+from loglicense.utils import RequirementsCollector
+from loglicense.utils import in_shard
+from loglicense.utils import uv_member_attribution
 
 
 UV_LOCK_FIXTURE = """version = 1
@@ -58,6 +89,58 @@ source = { registry = "https://pypi.org/simple" }
 """
 
 
+UV_WORKSPACE_FIXTURE = """version = 1
+
+[[package]]
+name = "api"
+version = "0.1.0"
+source = { editable = "api" }
+dependencies = [
+    { name = "core" },
+    { name = "typer" },
+]
+
+[[package]]
+name = "core"
+version = "0.1.0"
+source = { editable = "core" }
+dependencies = [
+    { name = "click" },
+]
+
+[package.dev-dependencies]
+dev = [
+    { name = "pytest" },
+]
+
+[[package]]
+name = "worker"
+version = "0.1.0"
+source = { virtual = "worker" }
+dependencies = [
+    { name = "typer" },
+]
+
+[[package]]
+name = "typer"
+version = "0.12.0"
+source = { registry = "https://pypi.org/simple" }
+dependencies = [
+    { name = "click" },
+]
+
+[[package]]
+name = "click"
+version = "8.1.7"
+source = { registry = "https://pypi.org/simple" }
+
+[[package]]
+name = "pytest"
+version = "8.0.0"
+source = { registry = "https://pypi.org/simple" }
+"""
+
+
 @pytest.mark.parametrize(
     "filename, content, packages_develop, packages_main",
     [
@@ -87,8 +170,8 @@ python-versions = ">=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*"
             """alabaster==0.7.12
 atomicwrites>=1.4.0
         """,
-            ["alabaster", "atomicwrites"],
-            ["alabaster", "atomicwrites"],
+            ["alabaster/0.7.12", "atomicwrites"],
+            ["alabaster/0.7.12", "atomicwrites"],
         ),
         (
             "pyproject.toml",
@@ -158,6 +241,69 @@ def test_dependency_file_parser(
     assert parser[filename](tmp_path, develop=False) == packages_main
 
 
+def test_uv_member_attribution(tmp_path: Path) -> None:
+    """Packages are attributed to every workspace member using them.
+
+    Args:
+        tmp_path: Path to temporary directory
+    """
+    lock_path = tmp_path / "uv.lock"
+    lock_path.write_text(UV_WORKSPACE_FIXTURE)
+
+    assert uv_member_attribution(lock_path) == {
+        "typer/0.12.0": ["api", "worker"],
+        "click/8.1.7": ["api", "core", "worker"],
+    }
+    assert uv_member_attribution(lock_path, develop=True)["pytest/8.0.0"] == ["core"]
+
+
+def test_in_shard_by_canonical_name() -> None:
+    """Spellings of a package name are assigned to the same shard."""
+    for index in range(1, 8):
+        assert in_shard("Zope_Interface/5.0", index, 7) == in_shard(
+            "zope.interface", index, 7
+        )
+
+
+def test_requirements_txt_includes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Includes are followed once, constraints pin and cycles are cut.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    (tmp_path / "requirements.txt").write_text(
+        "-r base.txt\n--requirement=web.txt\n-c constraints.txt\nclick\n"
+    )
+    (tmp_path / "base.txt").write_text("-r web.txt\ntyper==0.12.0  # cli\n")
+    (tmp_path / "web.txt").write_text("-r base.txt\nTyper\ntornado>=6\n")
+    (tmp_path / "constraints.txt").write_text("tornado==6.4\nnumpy==2.0\n")
+    (tmp_path / "requirements_dev.txt").write_text("-r base.txt\npytest\n")
+
+    reads: List[Path] = []
+    read = RequirementsCollector._read
+
+    def counted_read(cls: Any, path: Path) -> Any:
+        reads.append(path)
+        return read(path)
+
+    monkeypatch.setattr(RequirementsCollector, "_read", classmethod(counted_read))
+    parser = DependencyFileParser().parsers["requirements.txt"]
+
+    assert parser(tmp_path / "requirements.txt", develop=True) == [
+        "typer/0.12.0",
+        "tornado/6.4",
+        "click",
+        "pytest",
+    ]
+    assert sorted(x.name for x in reads) == sorted(
+        ["requirements.txt", "base.txt", "web.txt", "constraints.txt"]
+        + ["requirements_dev.txt"]
+    )
+
+
 def test_dependency_file_parser_resolves_uv_alias(tmp_path: Path) -> None:
     """Non-canonical uv lock filenames should still route to the uv parser."""
     lock_path = tmp_path / "uv-test.lock"
@@ -286,3 +432,684 @@ def test_license_logger_file_not_implemented(pkg_manager: str, tmp_path: Path) -
         assert pkg_manager == "pypi"
     except NotImplementedError:
         assert pkg_manager == "npm"
+
+
+def fake_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+    """Offline stand-in for ``urlopen`` serving PyPI-like JSON responses.
+
+    Args:
+        url: Requested URL
+        *args: Ignored positional arguments
+        **kwargs: Ignored keyword arguments
+
+    Returns:
+        io.BytesIO: The JSON response
+
+    Raises:
+        HTTPError: For packages not in the fake index
+    """
+    name = url.split("/pypi/")[1].split("/")[0]
+    if name not in FAKE_INDEX:
+        raise HTTPError(url, 404, "Not Found", Message(), None)
+    return io.BytesIO(json.dumps({"info": FAKE_INDEX[name]}).encode())
+
+
+FAKE_INDEX = {
+    "alabaster": {"name": "alabaster", "license": "BSD License"},
+    "atomicwrites": {"name": "atomicwrites", "license": "MIT"},
+}
+
+
+def test_license_logger_schedules_slowest_first(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Fetch timings are recorded and used to order later fetches.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr("loglicense.sources.urlopen", fake_urlopen)
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("alabaster\natomicwrites\nSOMETGINF\n")
+
+    license_log = LicenseLogger(
+        dependency_file=str(requirements), workers=4, cache_dir=str(tmp_path)
+    )
+    assert license_log.log_licenses() == [
+        ["Name", "License"],
+        ["alabaster", "BSD License"],
+        ["atomicwrites", "MIT"],
+        ["SOMETGINF", "Not found"],
+    ]
+    assert (tmp_path / "timings.json").is_file()
+
+    timings = FetchTimings(tmp_path / "timings.json")
+    timings.record("alabaster", 0.5, 10)
+    timings.record("atomicwrites", 3.0, 10)
+    assert timings.schedule(["alabaster", "new", "atomicwrites"]) == [
+        "new",
+        "atomicwrites",
+        "alabaster",
+    ]
+
+
+def test_adaptive_limit() -> None:
+    """The limit grows while latency is healthy and halves on throttling."""
+    limit = AdaptiveLimit(4, maximum=8)
+    for _ in range(50):
+        assert limit.acquire()
+        limit.release(0.01)
+    assert limit.limit == 8
+
+    limit.throttle(0.0)
+    assert limit.limit == 4
+    for _ in range(4):
+        assert limit.acquire()
+    assert not limit.acquire(timeout=0.01)
+    assert parse_retry_after("2") == 2.0 and parse_retry_after("soon") == 1.0
+
+
+def test_index_source_retries_throttled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Throttled requests are retried after Retry-After instead of failing.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    throttled: List[str] = []
+
+    def throttling_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        if url not in throttled:
+            throttled.append(url)
+            headers = Message()
+            headers["Retry-After"] = "0"
+            raise HTTPError(url, 429, "Too Many Requests", headers, None)
+        return fake_urlopen(url)
+
+    monkeypatch.setattr("loglicense.sources.urlopen", throttling_urlopen)
+    source = IndexSource(workers=4)
+    assert source.fetch_many(["alabaster", "atomicwrites"]).metadata == FAKE_INDEX
+    assert len(throttled) == 2 and source.limit.limit < 4
+
+    # Still throttled after the retries, the lookup failed, without a deadline
+    source = IndexSource(workers=1, retries=0)
+    assert source.fetch_many(["alabaster/1.0"]) == Lookup({})
+
+
+def test_index_source_flags_per_lookup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Packages abandoned or missing are flagged by the lookup that saw it.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr("loglicense.sources.urlopen", fake_urlopen)
+    source = IndexSource(workers=1)
+    lookup = source.fetch_many(["alabaster"], deadline=time.monotonic())
+    assert lookup == Lookup({}, frozenset({"alabaster"}))
+
+    assert source.fetch_many(["alabaster", "SOMETGINF"]) == Lookup(
+        {"alabaster": FAKE_INDEX["alabaster"]}, missing=frozenset({"SOMETGINF"})
+    )
+
+
+def test_license_logger_serves_stale_while_revalidating(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Expired entries are served at once and refreshed in the background.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr("loglicense.sources.urlopen", fake_urlopen)
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("alabaster\natomicwrites\n")
+    license_log = LicenseLogger(
+        dependency_file=str(requirements),
+        cache_dir=str(tmp_path / "cache"),
+        sources=["cache", "pypi"],
+        hard_ttl=86400.0 * 7,
+    )
+    outdated = {"name": "alabaster", "license": "Outdated"}
+    license_log.cache.merge(
+        {
+            "alabaster": CacheEntry(outdated, time.time() - 86400.0 * 2),
+            "atomicwrites": CacheEntry(outdated, time.time() - 86400.0 * 8),
+        }
+    )
+
+    assert license_log.log_licenses() == [
+        ["Name", "License"],
+        ["alabaster", "Outdated"],
+        ["atomicwrites", "MIT"],
+    ]
+    license_log.wait_for_refresh()
+    entry = license_log.cache.lookup("alabaster")
+    assert entry is not None and entry.metadata["license"] == "BSD License"
+
+
+def test_license_logger_abandons_slow_refreshes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Refreshes of a slow index are waited for only up to a timeout.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    answer = threading.Event()
+
+    def slow_metadata(
+        self: IndexSource, libname: str, deadline: Optional[float] = None
+    ) -> Any:
+        answer.wait()
+        return FAKE_INDEX[libname]
+
+    monkeypatch.setattr(IndexSource, "get_license_metadata", slow_metadata)
+    license_log = LicenseLogger(
+        cache_dir=str(tmp_path), sources=["cache", "pypi"], hard_ttl=86400.0 * 7
+    )
+    outdated = {"name": "alabaster", "license": "Outdated"}
+    license_log.cache.merge(
+        {"alabaster": CacheEntry(outdated, time.time() - 86400.0 * 2)}
+    )
+
+    assert license_log.fetch_metadata(["alabaster"]) == {"alabaster": outdated}
+    start = time.monotonic()
+    license_log.wait_for_refresh(0.05)
+    assert time.monotonic() - start < 1.0
+    assert all(x.daemon and x.is_alive() for x in license_log._refreshes)
+
+    answer.set()
+    license_log.wait_for_refresh()
+    assert not license_log._refreshes
+    entry = license_log.cache.lookup("alabaster")
+    assert entry is not None and entry.metadata["license"] == "BSD License"
+
+
+def test_index_source_stops_reading_after_info(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Responses are read only up to the members needed.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    wheel = {"packagetype": "bdist_wheel", "url": "https://host/a.whl"}
+    info = {"name": "alabaster", "license": "BSD License"}
+    releases = {str(x): [wheel] * 10 for x in range(2000)}
+    response = json.dumps({"info": info, "releases": releases, "urls": [wheel]})
+
+    def pypi_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        if "/0.7.12/" in url:
+            return io.BytesIO(json.dumps({"info": info, "urls": [wheel]}).encode())
+        return io.BytesIO(response.encode())
+
+    monkeypatch.setattr("loglicense.sources.urlopen", pypi_urlopen)
+    source = IndexSource(workers=1, max_response_size=len(response) - 1)
+
+    assert source.get_license_metadata("alabaster") == info
+    assert source.get_license_metadata("alabaster/0.7.12") == {
+        **info,
+        "wheel_url": "https://host/a.whl",
+        "urls_read": True,
+    }
+    _, size = source.timings.estimate("alabaster") or (0.0, len(response))
+    assert size < len(response) // 10
+    source.wheel_urls = True
+    assert source.get_license_metadata("alabaster") is None
+
+
+def test_index_source_read_deadline(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A response still trickling in is abandoned at the deadline.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    response = json.dumps({"info": {}, "padding": "x" * 2**20, "urls": []})
+
+    class TrickleResponse(io.BytesIO):
+        def read(self, size: Optional[int] = -1) -> bytes:
+            time.sleep(0.1)
+            return super().read(size)
+
+    timeouts: List[float] = []
+
+    def trickle_urlopen(url: str, timeout: float) -> io.BytesIO:
+        timeouts.append(timeout)
+        return TrickleResponse(response.encode())
+
+    monkeypatch.setattr("loglicense.sources.urlopen", trickle_urlopen)
+    source = IndexSource(workers=1)
+    start = time.monotonic()
+    assert source.get_license_metadata("alabaster/0.7.12", start + 0.3) is None
+    assert time.monotonic() - start < 1.0 and timeouts[0] <= 0.3
+
+    # Without a deadline, requests still time out
+    source.max_response_size = 0
+    assert source.get_license_metadata("alabaster") is None
+    assert timeouts[1] == FETCH_TIMEOUT
+
+
+def test_license_logger_source_chain(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Each source only answers what the earlier sources missed.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    mirror = tmp_path / "mirror"
+    (mirror / "alabaster").mkdir(parents=True)
+    (mirror / "alabaster" / "json").write_text(
+        json.dumps({"info": {"name": "alabaster", "license": "BSD License"}})
+    )
+    asked: List[List[str]] = []
+
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("packaging\nalabaster\nSOMETGINF\n")
+    license_log = LicenseLogger(
+        dependency_file=str(requirements),
+        cache_dir=str(tmp_path / "cache"),
+        sources=["installed", "cache", mirror.as_uri(), "pypi"],
+    )
+
+    def asked_index(
+        libnames: List[str], callback: Any, deadline: Optional[float]
+    ) -> Lookup:
+        asked.append(libnames)
+        return Lookup({})
+
+    monkeypatch.setattr(license_log.sources[-1], "fetch_many", asked_index)
+    licenses = license_log.log_licenses()
+
+    assert licenses[1][0] == "packaging" and licenses[1][1] != "Not found"
+    assert licenses[2:] == [["alabaster", "BSD License"], ["SOMETGINF", "Not found"]]
+    assert asked == [["SOMETGINF"]]
+
+
+def test_license_logger_negative_cache_and_private(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Private packages are never looked up and misses are cached.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    requested: List[str] = []
+
+    def recording_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        requested.append(url.split("/pypi/")[1].split("/")[0])
+        return fake_urlopen(url)
+
+    monkeypatch.setattr("loglicense.sources.urlopen", recording_urlopen)
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("Acme_Tools\nacme-db\nSOMETGINF\nalabaster\n")
+
+    for _ in range(2):
+        license_log = LicenseLogger(
+            dependency_file=str(requirements),
+            cache_dir=str(tmp_path),
+            private={"acme-db": "Proprietary", "acme-*": ""},
+        )
+        assert license_log.log_licenses()[1:] == [
+            ["Acme_Tools", "Private"],
+            ["acme-db", "Proprietary"],
+            ["SOMETGINF", "Not found"],
+            ["alabaster", "BSD License"],
+        ]
+    assert sorted(requested) == ["SOMETGINF", "alabaster"]
+
+    # Not found on a mirror while PyPI failed: not cached as missing
+    def failing_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        if url.startswith("https://mirror.example.com/"):
+            return fake_urlopen(url)
+        raise URLError("connection refused")
+
+    monkeypatch.setattr("loglicense.sources.urlopen", failing_urlopen)
+    license_log = LicenseLogger(
+        cache_dir=str(tmp_path),
+        sources=["https://mirror.example.com/pypi", "pypi"],
+    )
+    assert license_log.fetch_metadata(["lib-x"]) == {"lib-x": None}
+    assert license_log.cache.lookup("lib-x") is None
+
+
+def test_license_logger_resolve_many(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """One logger resolves packages given in memory for concurrent callers.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    monkeypatch.setattr("loglicense.sources.urlopen", fake_urlopen)
+    license_log = LicenseLogger(cache_dir=str(tmp_path), sources=["pypi"])
+    specs = ["alabaster==0.7.12", "atomicwrites", "SOMETGINF/1.0"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(license_log.resolve_many, [specs] * 16))
+
+    assert results[0] == (
+        PackageLicense(
+            "alabaster/0.7.12", "alabaster", "0.7.12", ("BSD License",), True
+        ),
+        PackageLicense("atomicwrites", "atomicwrites", "", ("MIT",), True),
+        PackageLicense("SOMETGINF/1.0", "SOMETGINF", "1.0", (), False),
+    )
+    assert all(x == results[0] for x in results)
+    assert not license_log.is_logged()
+    assert len({hash(x) for x in results}) == 1
+
+    # Unpinned answers kept in memory expire like the cache
+    license_log.resolved.cache.ttl = 0
+    memo = license_log.resolved.fetch_many(["alabaster/0.7.12", "atomicwrites"])
+    assert list(memo.metadata) == ["alabaster/0.7.12"]
+
+    # and are bounded, evicting the least recently stored first
+    memory = MetadataCache(max_entries=2)
+    for libname in ["alabaster", "atomicwrites", "alabaster", "click"]:
+        memory.store(libname, {"name": libname})
+    assert memory.lookup("atomicwrites") is None and len(memory) == 2
+
+    # Timed out lookups are told apart per call, without touching the logger
+    license_log.deadline = 0
+    assert license_log.resolve_many(["click"])[0].unresolved
+    assert not license_log.unresolved
+
+    # and the deadline starts with each call, however long the logger lived
+    license_log.deadline = 0.2
+    time.sleep(0.3)
+    assert not license_log.resolve_many(["click"])[0].unresolved
+
+
+def test_license_logger_transitive(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Dependencies are resolved breadth-first, one batch per level.
+
+    Extras asked for by a later requirer expand a package again.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    graph = {
+        "app": ["lib-a>=1", "lib-b; python_version < '3'", "lib-c[fast]"],
+        "lib-a": ["lib_c"],
+        "lib-c": ["lib-d; extra == 'fast'", "lib-e; extra == 'slow'"],
+        "lib-d": ["app", "lib-c[slow]"],
+    }
+    batches: List[List[str]] = []
+
+    def fetch_many(
+        libnames: List[str], callback: Any, deadline: Optional[float]
+    ) -> Lookup:
+        batches.append(libnames)
+        return Lookup(
+            {
+                x: {"name": x, "license": "MIT", "requires_dist": graph.get(x)}
+                for x in libnames
+            }
+        )
+
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("app\n")
+    license_log = LicenseLogger(
+        dependency_file=str(requirements),
+        cache_dir=str(tmp_path / "cache"),
+        sources=["pypi"],
+        transitive=True,
+    )
+    monkeypatch.setattr(license_log.sources[-1], "fetch_many", fetch_many)
+    licenses = license_log.log_licenses()
+
+    assert [x[0] for x in licenses[1:]] == ["app", "lib-a", "lib-c", "lib-d", "lib-e"]
+    assert batches == [["app"], ["lib-a", "lib-c"], ["lib-d"], ["lib-e"]]
+
+
+def make_tar(members: Dict[str, bytes], mode: Literal["w", "w:gz"] = "w") -> bytes:
+    """Write files into an in-memory tarball.
+
+    Args:
+        members: Content of every file by path
+        mode: Mode to open the tarball in, ``w:gz`` to compress it
+
+    Returns:
+        bytes: The tarball
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, content in members.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def test_scan_image_applies_whiteouts(tmp_path: Path) -> None:
+    """Packages of image layers are read in order, honouring whiteouts.
+
+    Args:
+        tmp_path: Path to temporary directory
+    """
+    site = "usr/lib/python3/site-packages"
+    base = "opt/venv/lib/python3.11/site-packages"
+
+    def metadata(name: str, version: str) -> bytes:
+        return f"Name: {name}\nVersion: {version}\nLicense: MIT\n".encode()
+
+    lower = make_tar(
+        {
+            f"{site}/six-1.0.dist-info/METADATA": metadata("six", "1.0"),
+            f"{site}/attrs-1.0.dist-info/METADATA": metadata("attrs", "1.0"),
+            f"{base}/click-8.0.dist-info/METADATA": metadata("click", "8.0"),
+        }
+    )
+    upper = make_tar(
+        {
+            f"{site}/.wh.six-1.0.dist-info": b"",
+            f"{base}/.wh..wh..opq": b"",
+            f"{base}/toml-0.10.dist-info/METADATA": metadata("toml", "0.10"),
+        },
+        "w:gz",
+    )
+    manifest = json.dumps([{"Layers": ["aaa/layer.tar", "bbb/layer.tar"]}])
+    image = tmp_path / "image.tar"
+    # Layers in reverse order, with the manifest last, like docker save
+    image.write_bytes(
+        make_tar(
+            {
+                "bbb/layer.tar": upper,
+                "aaa/layer.tar": lower,
+                "manifest.json": manifest.encode(),
+            }
+        )
+    )
+
+    license_log = LicenseLogger(
+        dependency_file=str(image),
+        dependency_source="image-tar",
+        cache_dir=str(tmp_path / "cache"),
+        sources=["cache"],
+    )
+    assert license_log.log_licenses() == [
+        ["Name", "License"],
+        ["attrs", "MIT"],
+        ["toml", "MIT"],
+    ]
+
+    # Without a manifest, tarballs inside a plain tree are not layers
+    tree = tmp_path / "tree.tar"
+    tree.write_bytes(
+        make_tar(
+            {
+                "data/upper.tar": upper,
+                f"{site}/six-1.0.dist-info/METADATA": metadata("six", "1.0"),
+            }
+        )
+    )
+    license_log = LicenseLogger(
+        dependency_file=str(tree),
+        dependency_source="image-tar",
+        cache_dir=str(tmp_path / "cache"),
+        sources=["cache"],
+    )
+    assert license_log.log_licenses() == [["Name", "License"], ["six", "MIT"]]
+
+
+def test_license_logger_sbom(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Licenses of an SBOM are used, only packages without one are looked up.
+
+    Args:
+        tmp_path: Path to temporary directory
+        monkeypatch: Pytest monkeypatch fixture
+    """
+    requested: List[str] = []
+
+    def recording_urlopen(url: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        requested.append(url)
+        return fake_urlopen(url)
+
+    monkeypatch.setattr("loglicense.sources.urlopen", recording_urlopen)
+    bom = {
+        "bomFormat": "CycloneDX",
+        "metadata": {"component": {"name": "app", "purl": "pkg:pypi/app@1.0"}},
+        "components": [
+            {
+                "name": "six",
+                "version": "1.16.0",
+                "purl": "pkg:pypi/six@1.16.0",
+                "licenses": [{"license": {"id": "MIT"}}],
+            },
+            {
+                "name": "alabaster",
+                "version": "0.7.12",
+                "purl": "pkg:pypi/alabaster@0.7.12",
+            },
+            {"name": "libc6", "version": "2.36", "purl": "pkg:deb/debian/libc6@2.36"},
+            {"name": "app-config", "version": "1.0"},
+        ],
+    }
+    sbom = tmp_path / "app.cdx.json"
+    sbom.write_text(json.dumps(bom))
+    license_log = LicenseLogger(
+        dependency_file=str(sbom), cache_dir=str(tmp_path / "cache"), sources=["pypi"]
+    )
+    assert license_log.log_licenses() == [
+        ["Name", "License"],
+        ["six", "MIT"],
+        ["alabaster", "BSD License"],
+    ]
+    assert len(requested) == 1 and "/alabaster/" in requested[0]
+
+    metadata = {"name": "six", "version": "1.16.0", "license": "MIT"}
+    inspect = {"version": "1", "installed": [{"metadata": metadata}]}
+    report = tmp_path / "pip-inspect.json"
+    report.write_text(json.dumps(inspect))
+    assert DependencyFileParser.parse_bom_json(report) == ["six/1.16.0"]
+    assert DependencyFileParser().resolve("rainbow.json") is None
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serves in-memory files, honouring single byte ranges."""
+
+    files: Dict[str, bytes] = {}
+    bytes_served = 0
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Serve a file or the requested range of it."""
+        content = self.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start, end = match.groups()
+            if not start:
+                start, end = str(max(0, len(content) - int(end))), ""
+            first, last = int(start), min(
+                int(end or len(content) - 1), len(content) - 1
+            )
+            body = content[first : last + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(content)}")
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        RangeRequestHandler.bytes_served += len(body)
+
+    def log_message(self, *args: Any) -> None:
+        """Keep the test output quiet.
+
+        Args:
+            *args: Ignored log arguments
+        """
+
+
+@pytest.fixture
+def range_server() -> Iterator[str]:
+    """Serve ``RangeRequestHandler.files`` on a local HTTP server.
+
+    Yields:
+        str: Base URL of the server
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_license_logger_deep_license(range_server: str, tmp_path: Path) -> None:
+    """Vague licenses are read from the license files of remote wheels.
+
+    Cached metadata fetched without the wheel URLs is looked up again.
+
+    Args:
+        range_server: Base URL of a local server supporting range requests
+        tmp_path: Path to temporary directory
+    """
+    wheel = io.BytesIO()
+    with zipfile.ZipFile(wheel, "w") as wheel_zip:
+        wheel_zip.writestr("vague/data.bin", os.urandom(1 << 20))
+        wheel_zip.writestr("vague-1.0.dist-info/METADATA", "Name: vague\n")
+        wheel_zip.writestr(
+            "vague-1.0.dist-info/licenses/LICENSE",
+            "MIT License\n\nPermission is hereby granted, free of charge, to any",
+        )
+    wheel_url = f"{range_server}/vague-1.0-py3-none-any.whl"
+    RangeRequestHandler.files = {
+        "/vague-1.0-py3-none-any.whl": wheel.getvalue(),
+        "/pypi/vague/json": json.dumps(
+            {
+                "info": {"name": "vague", "license": "see LICENSE"},
+                "urls": [{"packagetype": "bdist_wheel", "url": wheel_url}],
+            }
+        ).encode(),
+    }
+    RangeRequestHandler.bytes_served = 0
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("vague\n")
+
+    license_log = LicenseLogger(
+        dependency_file=str(requirements),
+        cache_dir=str(tmp_path),
+        sources=["cache", f"{range_server}/pypi"],
+        deep_license=True,
+    )
+    license_log.cache.store("vague", {"name": "vague", "license": "see LICENSE"})
+
+    assert license_log.log_licenses() == [["Name", "License"], ["vague", "MIT"]]
+    assert RangeRequestHandler.bytes_served < len(wheel.getvalue()) / 4